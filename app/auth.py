@@ -4,8 +4,8 @@ from jwt import InvalidTokenError
 from tortoise.exceptions import DoesNotExist, MultipleObjectsReturned
 
 from app.logs import logger
-from app.models.token_blacklist import BlacklistedToken
 from app.models.user import User
+from app.revocation import is_token_revoked
 
 security = HTTPBearer()
 
@@ -25,7 +25,7 @@ async def get_user(
     """
     token = credentials.credentials
 
-    if await BlacklistedToken.is_token_blacklisted(token):
+    if await is_token_revoked(token):
         logger.warning(f"Attempted login with blacklisted token: {token}")
         raise AuthenticationError
 
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from collections.abc import Callable
+
+from pyttings import settings
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.logs import logger
+
+PREFIX = "broadcast:"
+
+
+class Broadcast(ABC):
+    """
+    Publishes messages on named channels to the subscribers of every process,
+    this one included. Delivery is best effort: a process that is down or
+    disconnected misses the messages published meanwhile.
+    """
+
+    def __init__(self) -> None:
+        self._subscribers: dict[str, list[Callable[[str], None]]] = defaultdict(list)
+        self.connected = True
+
+    def subscribe(self, channel: str, callback: Callable[[str], None]) -> None:
+        self._subscribers[channel].append(callback)
+
+    def unsubscribe(self, channel: str, callback: Callable[[str], None]) -> None:
+        with contextlib.suppress(ValueError):
+            self._subscribers[channel].remove(callback)
+
+    def deliver(self, channel: str, message: str) -> None:
+        for callback in list(self._subscribers[channel]):
+            callback(message)
+
+    @abstractmethod
+    async def publish(self, channel: str, message: str) -> None:
+        pass
+
+    async def start(self) -> None:
+        """Start receiving the messages of other processes."""
+
+    async def stop(self) -> None:
+        pass
+
+
+class LocalBroadcast(Broadcast):
+    """Messages delivered in this process only, for a single worker and tests."""
+
+    async def publish(self, channel: str, message: str) -> None:
+        self.deliver(channel, message)
+
+
+class RedisBroadcast(Broadcast):
+    """Messages shared by every worker and replica through Redis pub/sub."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.redis = Redis(
+            host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=settings.REDIS_DB
+        )
+        self.connected = False
+        self.retry_delay = 1.0  # in seconds, doubled on each failed attempt
+        self._listener: asyncio.Task | None = None
+
+    async def publish(self, channel: str, message: str) -> None:
+        await self.redis.publish(f"{PREFIX}{channel}", message)
+
+    async def start(self) -> None:
+        self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        """Receive messages, reconnecting with backoff whenever Redis fails."""
+        failures = 0
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.psubscribe(f"{PREFIX}*")
+                self.connected = True
+                failures = 0
+                async for message in pubsub.listen():
+                    channel = message["channel"].decode().removeprefix(PREFIX)
+                    self.deliver(channel, message["data"].decode())
+            except (RedisError, OSError):
+                logger.exception("Lost the connection to broadcasts")
+            finally:
+                self.connected = False
+                with contextlib.suppress(RedisError, OSError):
+                    await pubsub.aclose()
+            failures += 1
+            await asyncio.sleep(min(self.retry_delay * 2 ** (failures - 1), 30))
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._listener
+            self._listener = None
+            logger.info("Stopped listening to broadcasts")
+
+
+def get_broadcast() -> Broadcast:
+    if settings.BROADCAST_BACKEND == "redis":
+        return RedisBroadcast()
+    return LocalBroadcast()
+
+
+broadcast = get_broadcast()
@@ -0,0 +1,225 @@
+"""
+Export schedule statuses and log timestamps as columnar files, one per day.
+
+    python -m app.commands.export --since 2025-01-01 --until 2025-02-01
+    python -m app.commands.export --format arrow --output /data/remedi
+
+Writes <output>/<dataset>/date=<YYYY-MM-DD>/part-0.<parquet|arrow> for the
+medication_schedules and medication_logs datasets, with days in UTC and no
+file for days without rows. The default is yesterday, for a nightly run. Rows
+are read in batches straight into Arrow columns, on Postgres from a
+server-side cursor. Needs pyarrow, from the `analytics` extra.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyttings import settings
+from tortoise import connections
+from tortoise.models import Model
+
+from app.database import close_db, init_db, is_postgres
+from app.logs import logger
+from app.models.medication import Medication
+from app.models.medication_log import MedicationLog
+from app.models.medication_schedule import MedicationSchedule
+from app.utils.clock import utc_now
+
+TIMESTAMP = pa.timestamp("us", tz="UTC")
+
+
+@dataclass(frozen=True)
+class Dataset:
+    name: str
+    model: type[Model]
+    day_field: str  # datetime field the rows are partitioned by
+    fields: tuple[str, ...]  # read with values_list, the id first
+    schema: pa.Schema
+    sql: str  # the same columns on Postgres, for the day range $1 to $2
+
+    def postgres_query(self) -> str:
+        # Table names are only known once Tortoise is initialized
+        return self.sql.format(
+            table=self.model._meta.db_table, medication=Medication._meta.db_table
+        )
+
+
+SCHEDULES = Dataset(
+    name="medication_schedules",
+    model=MedicationSchedule,
+    day_field="scheduled_datetime",
+    fields=(
+        "id",
+        "medication_id",
+        "medication__person_id",
+        "scheduled_datetime",
+        "status",
+    ),
+    schema=pa.schema(
+        [
+            ("id", pa.int64()),
+            ("medication_id", pa.int64()),
+            ("person_id", pa.int64()),
+            ("scheduled_datetime", TIMESTAMP),
+            ("status", pa.string()),
+        ]
+    ),
+    sql="""
+        SELECT s."id", s."medication_id", m."person_id", s."scheduled_datetime",
+            s."status"
+        FROM "{table}" s
+        JOIN "{medication}" m ON m."id" = s."medication_id"
+        WHERE s."scheduled_datetime" >= $1 AND s."scheduled_datetime" < $2
+    """,
+)
+
+LOGS = Dataset(
+    name="medication_logs",
+    model=MedicationLog,
+    day_field="taken_at",
+    fields=("id", "medication_id", "medication__person_id", "schedule_id", "taken_at"),
+    schema=pa.schema(
+        [
+            ("id", pa.int64()),
+            ("medication_id", pa.int64()),
+            ("person_id", pa.int64()),
+            ("schedule_id", pa.int64()),
+            ("taken_at", TIMESTAMP),
+        ]
+    ),
+    sql="""
+        SELECT l."id", l."medication_id", m."person_id", l."schedule_id",
+            l."taken_at"
+        FROM "{table}" l
+        JOIN "{medication}" m ON m."id" = l."medication_id"
+        WHERE l."taken_at" >= $1 AND l."taken_at" < $2
+    """,
+)
+
+DATASETS = (SCHEDULES, LOGS)
+
+
+async def read_batches(
+    dataset: Dataset, start: datetime, end: datetime, batch_size: int
+) -> AsyncIterator[list]:
+    """Yield the rows of [start, end) as tuples, `batch_size` at a time."""
+    if is_postgres():
+        async with (
+            connections.get("default").acquire_connection() as connection,
+            connection.transaction(),
+        ):
+            cursor = await connection.cursor(dataset.postgres_query(), start, end)
+            while rows := await cursor.fetch(batch_size):
+                yield rows
+        return
+
+    query = dataset.model.filter(
+        **{f"{dataset.day_field}__gte": start, f"{dataset.day_field}__lt": end}
+    )
+    last_id = 0
+    while rows := (
+        await query.filter(id__gt=last_id)
+        .order_by("id")
+        .limit(batch_size)
+        .values_list(*dataset.fields)
+    ):
+        yield rows
+        last_id = rows[-1][0]
+
+
+def to_record_batch(dataset: Dataset, rows: list) -> pa.RecordBatch:
+    """Transpose the rows into one Arrow array per column."""
+    columns = zip(*rows, strict=True)
+    return pa.RecordBatch.from_arrays(
+        [
+            pa.array(column, type=field.type)
+            for column, field in zip(columns, dataset.schema, strict=True)
+        ],
+        schema=dataset.schema,
+    )
+
+
+async def export_day(
+    dataset: Dataset, day: date, output: Path, export_format: str, batch_size: int
+) -> int:
+    """Write the rows of a UTC day to its partition, returns the rows written."""
+    start = datetime.combine(day, time(), tzinfo=ZoneInfo("UTC"))
+    path = output / dataset.name / f"date={day.isoformat()}" / f"part-0.{export_format}"
+    writer: pq.ParquetWriter | pa.ipc.RecordBatchFileWriter | None = None
+    written = 0
+    try:
+        async for rows in read_batches(
+            dataset, start, start + timedelta(days=1), batch_size
+        ):
+            if writer is None:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                writer = (
+                    pq.ParquetWriter(path, dataset.schema)
+                    if export_format == "parquet"
+                    else pa.ipc.new_file(path, dataset.schema)
+                )
+            writer.write_batch(to_record_batch(dataset, rows))
+            written += len(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
+
+
+async def export(
+    since: date,
+    until: date,
+    output: Path,
+    export_format: str = "parquet",
+    batch_size: int | None = None,
+) -> dict[str, int]:
+    """Export the days from `since` to `until`, exclusive, returns rows per dataset."""
+    batch_size = batch_size or settings.EXPORT_CHUNK_SIZE
+    counts = dict.fromkeys((dataset.name for dataset in DATASETS), 0)
+    day = since
+    while day < until:
+        for dataset in DATASETS:
+            counts[dataset.name] += await export_day(
+                dataset, day, output, export_format, batch_size
+            )
+        day += timedelta(days=1)
+    return counts
+
+
+def parse_args() -> argparse.Namespace:
+    today = utc_now().date()
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--since", type=date.fromisoformat, default=today - timedelta(days=1)
+    )
+    parser.add_argument(
+        "--until", type=date.fromisoformat, default=today, help="exclusive"
+    )
+    parser.add_argument("--output", type=Path, default=Path("exports"))
+    parser.add_argument("--format", choices=["parquet", "arrow"], default="parquet")
+    parser.add_argument("--batch-size", type=int, default=settings.EXPORT_CHUNK_SIZE)
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> None:
+    await init_db()
+    try:
+        counts = await export(
+            args.since, args.until, args.output, args.format, args.batch_size
+        )
+        logger.info(f"Exported {counts} to {args.output}")
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,61 @@
+"""
+Rebuild the daily adherence rollup from the medication schedules.
+
+    python -m app.commands.rebuild_adherence
+    python -m app.commands.rebuild_adherence --start 1000 --end 2000
+
+Medications are recounted in ranges of --chunk-size ids, one transaction per
+range, so the rollup of a range is never seen half written. Run it to backfill
+the rollup and after changing the timezone of a user.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from app.database import close_db, init_db
+from app.logs import logger
+from app.models.medication import Medication
+from app.models.medication_schedule import MedicationSchedule
+
+
+async def rebuild(
+    start: int = 1, end: int | None = None, chunk_size: int = 1000
+) -> int:
+    """Rebuild the rollup of the medications in [start, end), returns its rows."""
+    if end is None:
+        last = await Medication.all().order_by("-id").first()
+        end = last.id + 1 if last is not None else start
+    rows = 0
+    for first in range(start, end, chunk_size):
+        chunk_end = min(first + chunk_size, end)
+        rows += await MedicationSchedule.rebuild_daily_adherence((first, chunk_end))
+        logger.info(f"Rebuilt the daily adherence of medications {first}-{chunk_end}")
+    return rows
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--start", type=int, default=1, help="first medication id")
+    parser.add_argument("--end", type=int, help="medication id to stop before")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> None:
+    await init_db()
+    try:
+        started = time.perf_counter()
+        rows = await rebuild(args.start, args.end, args.chunk_size)
+        logger.info(
+            f"Rebuilt {rows} daily adherence rows in "
+            f"{time.perf_counter() - started:.1f}s"
+        )
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
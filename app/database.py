@@ -1,24 +1,77 @@
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
 from pyttings import settings
-from tortoise import Tortoise
-
-TORTOISE_ORM = {
-    "connections": {
-        "default": f"postgres://{settings.DB_USER}:{settings.DB_PASSWORD}"
-        f"@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
-    },
-    "apps": {
-        "models": {
-            "models": ["app.models", "aerich.models"],
-            "default_connection": "default",
+from tortoise import Tortoise, connections
+from tortoise.transactions import in_transaction
+
+# Callbacks of the outermost transaction, run once it is committed
+_on_commit: ContextVar[list[Callable[[], Awaitable[object]]] | None] = ContextVar(
+    "on_commit", default=None
+)
+
+
+def get_tortoise_config(pool_size: int) -> dict:
+    return {
+        "connections": {
+            "default": f"postgres://{settings.DB_USER}:{settings.DB_PASSWORD}"
+            f"@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
+            f"?maxsize={pool_size}"
         },
-    },
-}
+        "apps": {
+            "models": {
+                "models": ["app.models", "aerich.models"],
+                "default_connection": "default",
+            },
+        },
+    }
+
+
+TORTOISE_ORM = get_tortoise_config(settings.DB_POOL_SIZE)
 
 
-async def init_db() -> None:
-    await Tortoise.init(config=TORTOISE_ORM)
+async def init_db(pool_size: int = settings.DB_POOL_SIZE) -> None:
+    """Connect to the database with a pool of up to `pool_size` connections."""
+    await Tortoise.init(config=get_tortoise_config(pool_size))
     await Tortoise.generate_schemas()
 
 
 async def close_db() -> None:
     await Tortoise.close_connections()
+
+
+def is_postgres() -> bool:
+    """Returns True if the default connection is Postgres (tests run on SQLite)."""
+    return connections.get("default").capabilities.dialect == "postgres"
+
+
+@asynccontextmanager
+async def transaction() -> AsyncIterator[None]:
+    """
+    Run a block in a transaction, like `in_transaction`, then the callbacks
+    registered with `on_commit` once the outermost transaction is committed.
+    """
+    if _on_commit.get() is not None:
+        async with in_transaction():
+            yield
+        return
+
+    callbacks: list[Callable[[], Awaitable[object]]] = []
+    token = _on_commit.set(callbacks)
+    try:
+        async with in_transaction():
+            yield
+    finally:
+        _on_commit.reset(token)
+    for callback in callbacks:
+        await callback()
+
+
+async def on_commit(callback: Callable[[], Awaitable[object]]) -> None:
+    """Await `callback` once the current transaction is committed, or now."""
+    callbacks = _on_commit.get()
+    if callbacks is None:
+        await callback()
+    else:
+        callbacks.append(callback)
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from redis.exceptions import RedisError
+from tortoise.exceptions import BaseORMException
+
+from app.logs import logger
+from app.notifications.channels import NotificationError
+
+
+class Dispatcher:
+    """
+    Runs coroutines on a bounded pool of workers fed by a bounded queue.
+    `submit` waits while the queue is full, pushing back on the producer.
+    Delivery and database errors are counted as failures, a worker stopped by
+    any other error is replaced.
+    """
+
+    def __init__(self, concurrency: int, max_queue_size: int) -> None:
+        self.concurrency = concurrency
+        self.max_queue_size = max_queue_size
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self._workers: list[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._workers = [self._spawn() for _ in range(self.concurrency)]
+
+    def _spawn(self) -> asyncio.Task:
+        worker = asyncio.create_task(self._work())
+        worker.add_done_callback(self._stopped)
+        return worker
+
+    def _stopped(self, worker: asyncio.Task) -> None:
+        if worker.cancelled() or worker.exception() is None:
+            return
+        self.failed += 1
+        logger.error("Dispatcher worker stopped", exc_info=worker.exception())
+        if worker in self._workers:  # not shut down
+            self._workers.remove(worker)
+            self._workers.append(self._spawn())
+
+    async def submit(
+        self, func: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any
+    ) -> None:
+        """Queue a call, waiting for room in the queue if it is full."""
+        self.start()
+        await self._queue.put((func, args, kwargs))
+
+    async def shutdown(self) -> None:
+        """Wait for queued and in-flight calls to finish, then stop the workers."""
+        if not self.running:
+            return
+        await self._queue.join()
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        logger.info(f"Dispatcher stopped: {self.stats}")
+
+    async def _work(self) -> None:
+        while True:
+            func, args, kwargs = await self._queue.get()
+            self.in_flight += 1
+            try:
+                await func(*args, **kwargs)
+                self.completed += 1
+            except (NotificationError, BaseORMException, OSError, RedisError):
+                self.failed += 1
+                logger.exception(f"Dispatched call failed: {func.__qualname__}")
+            finally:
+                self.in_flight -= 1
+                self._queue.task_done()
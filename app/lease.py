@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import itertools
+import math
+import time
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
+
+from pyttings import settings
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.logs import logger
+
+# Release or extend a lease only if it is still held with our token
+RELEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+EXTEND_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("PEXPIRE", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class LeaseBackend(ABC):
+    """
+    Grants named leases for `ttl` seconds. A granted lease is identified by a
+    token that increases on every grant, so a holder whose lease expired can
+    no longer extend or release it. Writes are not checked against the token:
+    the scheduler jobs only make conditional status transitions and inserts
+    that skip existing rows, so a holder that stalls past its lease and
+    overlaps with the next one cannot apply a change twice.
+    """
+
+    @abstractmethod
+    async def acquire(self, name: str, ttl: int) -> int | None:
+        """Returns the lease token, or None if the lease is held elsewhere."""
+
+    @abstractmethod
+    async def extend(self, name: str, token: int, ttl: int) -> bool:
+        pass
+
+    @abstractmethod
+    async def release(self, name: str, token: int) -> None:
+        pass
+
+
+class LocalLeaseBackend(LeaseBackend):
+    """Leases held in memory, for a single process and tests."""
+
+    def __init__(self) -> None:
+        self._leases: dict[str, tuple[int, float]] = {}  # name: (token, expires)
+        self._tokens = itertools.count(1)
+
+    def _holder(self, name: str) -> int | None:
+        token, expires = self._leases.get(name, (None, 0.0))
+        return token if expires > time.monotonic() else None
+
+    async def acquire(self, name: str, ttl: int) -> int | None:
+        if self._holder(name) is not None:
+            return None
+        token = next(self._tokens)
+        self._leases[name] = (token, time.monotonic() + ttl)
+        return token
+
+    async def extend(self, name: str, token: int, ttl: int) -> bool:
+        if self._holder(name) != token:
+            return False
+        self._leases[name] = (token, time.monotonic() + ttl)
+        return True
+
+    async def release(self, name: str, token: int) -> None:
+        if self._holder(name) == token:
+            del self._leases[name]
+
+
+class RedisLeaseBackend(LeaseBackend):
+    """Leases shared by every replica through Redis."""
+
+    def __init__(self) -> None:
+        self.redis = Redis(
+            host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=settings.REDIS_DB
+        )
+
+    async def acquire(self, name: str, ttl: int) -> int | None:
+        token = await self.redis.incr(f"lease:{name}:fence")
+        if await self.redis.set(f"lease:{name}", token, nx=True, ex=ttl):
+            return token
+        return None
+
+    async def extend(self, name: str, token: int, ttl: int) -> bool:
+        return bool(
+            await self.redis.eval(EXTEND_SCRIPT, 1, f"lease:{name}", token, ttl * 1000)
+        )
+
+    async def release(self, name: str, token: int) -> None:
+        await self.redis.eval(RELEASE_SCRIPT, 1, f"lease:{name}", token)
+
+
+class LeaseLost(Exception):
+    """Raised in a leased block whose lease expired or was taken over."""
+
+
+@contextlib.asynccontextmanager
+async def leased(
+    backend: LeaseBackend, name: str, ttl: int, hold: float = 0
+) -> AsyncIterator[int | None]:
+    """
+    Hold the lease `name` for the duration of the block, extending it every
+    third of `ttl`, and for `hold` seconds from its start if the block ends
+    sooner. Yields the lease token, or None if the lease is held by another
+    replica or cannot be acquired, in which case the block must not do any work.
+    A failed extension is retried on the next beat while the lease may still be
+    held. If the lease is lost while held, the block is cancelled and LeaseLost
+    raised.
+    """
+    try:
+        token = await backend.acquire(name, ttl)
+    except (RedisError, OSError):
+        logger.exception(f"Failed to acquire lease {name}")
+        token = None
+    if token is None:
+        yield None
+        return
+
+    started = time.monotonic()
+    task = asyncio.current_task()
+    lost = False
+
+    async def heartbeat() -> None:
+        nonlocal lost
+        extended = started
+        while True:
+            await asyncio.sleep(ttl / 3)
+            try:
+                held = await backend.extend(name, token, ttl)
+            except (RedisError, OSError):
+                logger.exception(f"Failed to extend lease {name} (token {token})")
+                # Retried on the next beat, unless the lease expires before it
+                held = time.monotonic() - extended + ttl / 3 < ttl
+            else:
+                extended = time.monotonic()
+            if not held:
+                logger.warning(f"Lost lease {name} (token {token})")
+                lost = True
+                if task is not None:
+                    task.cancel()
+                return
+
+    heartbeat_task = asyncio.create_task(heartbeat())
+    try:
+        yield token
+    except asyncio.CancelledError:
+        if lost and task is not None:
+            task.uncancel()
+            raise LeaseLost(name) from None
+        raise
+    finally:
+        heartbeat_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await heartbeat_task
+        if not lost:
+            remaining = hold - (time.monotonic() - started)
+            try:
+                if remaining >= 1:  # kept so that later ticks of other replicas skip
+                    await backend.extend(name, token, math.ceil(remaining))
+                else:
+                    await backend.release(name, token)
+            except (RedisError, OSError):
+                # The lease expires by itself after `ttl`
+                logger.exception(f"Failed to release lease {name} (token {token})")
+
+
+def get_lease_backend() -> LeaseBackend:
+    if settings.SCHEDULER_LEASE_BACKEND == "redis":
+        return RedisLeaseBackend()
+    return LocalLeaseBackend()
@@ -1,10 +1,13 @@
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import JSONResponse
 from pyttings import settings
 
+from app.broadcast import broadcast
 from app.database import close_db, init_db
+from app.models.user import claims, users
+from app.passwords import PasswordsBusy
 from app.routers import ROUTERS
 from app.scheduler import Scheduler
 
@@ -14,9 +17,12 @@ scheduler = Scheduler()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
-    scheduler.start()
+    await broadcast.start()
+    if settings.SCHEDULER_ENABLED:
+        scheduler.start()
     yield
-    scheduler.shutdown()
+    await scheduler.shutdown()
+    await broadcast.stop()
     await close_db()
 
 
@@ -30,6 +36,15 @@ async def maintenance_mode(request: Request, call_next):
     return await call_next(request)
 
 
+@app.exception_handler(PasswordsBusy)
+async def passwords_busy(request: Request, exc: PasswordsBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many requests, try again later"},
+        headers={"Retry-After": "1"},
+    )
+
+
 for router in ROUTERS:
     app.include_router(router)
 
@@ -37,3 +52,11 @@ for router in ROUTERS:
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
+
+
+@app.get("/health/caches", include_in_schema=False)
+async def cache_stats():
+    """Size, hits and misses of the caches of this worker, if enabled."""
+    if not settings.CACHE_STATS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return {"users": users.stats, "tokens": claims.stats}
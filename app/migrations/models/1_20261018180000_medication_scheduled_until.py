@@ -0,0 +1,17 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "medication" ADD "scheduled_until" TIMESTAMPTZ;
+        UPDATE "medication" SET "scheduled_until" = (
+            SELECT MAX("scheduled_datetime") FROM "medicationschedule"
+            WHERE "medicationschedule"."medication_id" = "medication"."id"
+        );
+        CREATE INDEX IF NOT EXISTS "idx_medication_is_acti_fd66aa" ON "medication" ("is_active", "is_prn", "scheduled_until");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_medication_is_acti_fd66aa";
+        ALTER TABLE "medication" DROP COLUMN IF EXISTS "scheduled_until";"""
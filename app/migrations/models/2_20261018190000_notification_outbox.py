@@ -0,0 +1,28 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "notification_outbox" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "channel" VARCHAR(20) NOT NULL,
+    "payload" JSONB NOT NULL,
+    "status" VARCHAR(7) NOT NULL DEFAULT 'pending',
+    "attempts" INT NOT NULL DEFAULT 0,
+    "available_at" TIMESTAMPTZ NOT NULL,
+    "sent_at" TIMESTAMPTZ,
+    "last_error" TEXT,
+    "created_at" TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "schedule_id" INT NOT NULL REFERENCES "medicationschedule" ("id") ON DELETE CASCADE,
+    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE,
+    CONSTRAINT "uid_notificatio_schedul_60c5b0" UNIQUE ("schedule_id", "channel")
+);
+CREATE INDEX IF NOT EXISTS "idx_notificatio_status_e21f90" ON "notification_outbox" ("status", "available_at");
+COMMENT ON COLUMN "notification_outbox"."status" IS 'PENDING: pending\nSENT: sent\nFAILED: failed';
+COMMENT ON TABLE "notification_outbox" IS 'Outbox of notifications, written with the schedule status transition.';"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "notification_outbox";"""
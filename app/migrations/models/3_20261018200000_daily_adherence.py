@@ -0,0 +1,28 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "daily_adherence" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "day" DATE NOT NULL,
+    "status" VARCHAR(10) NOT NULL,
+    "count" INT NOT NULL DEFAULT 0,
+    "medication_id" INT NOT NULL REFERENCES "medication" ("id") ON DELETE CASCADE,
+    CONSTRAINT "uid_daily_adher_medicat_6fa7d8" UNIQUE ("medication_id", "day", "status")
+);
+COMMENT ON TABLE "daily_adherence" IS 'Settled schedules per medication, day in the user timezone and status.';
+        INSERT INTO "daily_adherence" ("medication_id", "day", "status", "count")
+        SELECT s."medication_id", (s."scheduled_datetime" AT TIME ZONE u."timezone")::date,
+            s."status", count(*)
+        FROM "medicationschedule" s
+        JOIN "medication" m ON m."id" = s."medication_id"
+        JOIN "person" p ON p."id" = m."person_id"
+        JOIN "user" u ON u."id" = p."user_id"
+        WHERE s."status" IN ('taken', 'late_taken', 'skipped', 'missed')
+        GROUP BY 1, 2, 3;"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "daily_adherence";"""
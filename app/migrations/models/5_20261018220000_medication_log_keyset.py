@@ -0,0 +1,13 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_medicationl_medicat_e3b015";
+        CREATE INDEX IF NOT EXISTS "idx_medicationl_medicat_64103a" ON "medicationlog" ("medication_id", "taken_at", "id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_medicationl_medicat_64103a";
+        CREATE INDEX IF NOT EXISTS "idx_medicationl_medicat_e3b015" ON "medicationlog" ("medication_id", "taken_at");"""
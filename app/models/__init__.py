@@ -1,15 +1,19 @@
+from app.models.daily_adherence import DailyAdherence
 from app.models.medication import Medication
 from app.models.medication_log import MedicationLog
 from app.models.medication_schedule import MedicationSchedule
+from app.models.notification import Notification
 from app.models.person import Person
 from app.models.token_blacklist import BlacklistedToken
 from app.models.user import User
 
 __all__ = [
     "BlacklistedToken",
+    "DailyAdherence",
     "Medication",
     "MedicationLog",
     "MedicationSchedule",
+    "Notification",
     "Person",
     "User",
 ]
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from collections import Counter
+from datetime import date, datetime, time
+from typing import TYPE_CHECKING
+
+from tortoise import connections, fields
+from tortoise.models import Model
+
+from app.database import is_postgres
+from app.utils.date import Period, truncate
+
+if TYPE_CHECKING:
+    from app.models.medication import Medication
+
+
+class DailyAdherence(Model):
+    """Settled schedules per medication, day in the user timezone and status."""
+
+    # Kept up to date by the status transitions of MedicationSchedule
+
+    id = fields.IntField(primary_key=True)
+    medication: fields.ForeignKeyRelation[Medication] = fields.ForeignKeyField(
+        "models.Medication", related_name="daily_adherence"
+    )
+    day = fields.DateField()
+    status = fields.CharField(max_length=10)  # a settled MedicationStatus
+    count = fields.IntField(default=0)
+
+    class Meta:
+        table = "daily_adherence"
+        unique_together = ("medication", "day", "status")
+
+    @classmethod
+    async def count_by_period(
+        cls, medication_ids: list[int], start: date, end: date, period: Period
+    ) -> list[dict]:
+        """
+        Sum the counts of the medications from start to end, exclusive, by
+        medication, status and period. Returns {medication_id, status, period,
+        count} rows, the period being the date it starts on.
+        """
+        if not medication_ids:
+            return []
+        if is_postgres():
+            return await connections.get("default").execute_query_dict(
+                f"""
+                SELECT "medication_id", "status",
+                    date_trunc($4, "day")::date AS "period",
+                    sum("count")::int AS "count"
+                FROM "{cls._meta.db_table}"
+                WHERE "medication_id" = ANY($1::int[])
+                    AND "day" >= $2 AND "day" < $3
+                GROUP BY 1, 2, 3
+                """,
+                [medication_ids, start, end, period.value],
+            )
+
+        counts: Counter[tuple[int, str, date]] = Counter()
+        for row in await cls.filter(
+            medication_id__in=medication_ids, day__gte=start, day__lt=end
+        ).values("medication_id", "status", "day", "count"):
+            period_start = truncate(datetime.combine(row["day"], time()), period)
+            key = (row["medication_id"], row["status"], period_start.date())
+            counts[key] += row["count"]
+        return [
+            {
+                "medication_id": medication_id,
+                "status": status,
+                "period": day,
+                "count": n,
+            }
+            for (medication_id, status, day), n in counts.items()
+        ]
+
+    def __str__(self) -> str:
+        return (
+            f"DailyAdherence(day={self.day}, status={self.status}, count={self.count})"
+        )
@@ -2,14 +2,18 @@ from __future__ import annotations
 
 from datetime import datetime, timedelta
 from typing import TYPE_CHECKING
-from zoneinfo import ZoneInfo
 
+from pyttings import settings
 from tortoise import fields
+from tortoise.functions import Count
 from tortoise.models import Model
 
+from app.database import is_postgres, transaction
 from app.logs import logger
 from app.models.medication_log import MedicationLog
 from app.models.medication_schedule import MedicationSchedule, MedicationStatus
+from app.timer import due_timer
+from app.utils.clock import utc_now
 
 if TYPE_CHECKING:
     from app.models.person import Person
@@ -30,6 +34,7 @@ class Medication(Model):
     frequency = fields.TimeDeltaField(null=True)
     total_doses = fields.IntField(null=True)
     doses_taken = fields.IntField(default=0)
+    scheduled_until = fields.DatetimeField(null=True)  # last schedule generated
     is_active = fields.BooleanField(default=True, db_index=True)
     notes = fields.TextField(null=True)
     created_at = fields.DatetimeField(auto_now_add=True)
@@ -40,7 +45,10 @@ class Medication(Model):
 
     class Meta:
         unique_together = ("person", "name", "dosage", "start_date")
-        indexes = ("start_date", "end_date", "is_active", "is_prn")
+        indexes = (
+            ("start_date", "end_date", "is_active", "is_prn"),
+            ("is_active", "is_prn", "scheduled_until"),
+        )
 
     @property
     async def next_scheduled(self) -> MedicationSchedule | None:
@@ -88,56 +96,144 @@ class Medication(Model):
         Skip if already created.
         """
         logger.info(f"Generating medication schedules for: {self}")
-        if self.is_prn:
-            return
+        await Medication.generate_schedules_for([self], delta)
+
+    @classmethod
+    async def generate_schedules_for(
+        cls, medications: list[Medication], delta: timedelta | None = None
+    ) -> int:
+        """
+        Create medication schedules for many medications for a defined period.
+        Each medication resumes after its `scheduled_until` watermark, the new
+        schedules are computed in memory and written with batched inserts, or
+        expanded by Postgres itself when SCHEDULE_GENERATION_SERVER_SIDE is set.
+        The watermarks are advanced in the same transaction.
+        Returns the number of schedules sent to the database.
+        """
+        medications = [med for med in medications if not med.is_prn]
+        if not medications:
+            return 0
 
         if delta is None:
-            delta = timedelta(days=1)
+            delta = timedelta(hours=settings.SCHEDULE_GENERATION_HORIZON)
 
-        now = datetime.now(ZoneInfo("UTC"))
-        schedule_end = now + delta
-        next_scheduled: MedicationSchedule | None = await self.next_scheduled
-        current_datetime = max(
-            now if next_scheduled is None else next_scheduled.scheduled_datetime,
-            self.start_date,
-        )
+        now = utc_now()
+        # Doses still pending count towards total_doses
+        capped_ids = [med.id for med in medications if med.total_doses is not None]
+        pending: dict[int, int] = {}
+        if capped_ids:
+            pending = {
+                row["medication_id"]: row["count"]
+                for row in await MedicationSchedule.filter(
+                    medication_id__in=capped_ids,
+                    status__in=[MedicationStatus.SCHEDULED, MedicationStatus.NOTIFIED],
+                )
+                .annotate(count=Count("id"))
+                .group_by("medication_id")
+                .values("medication_id", "count")
+            }
 
-        if self.end_date is not None and schedule_end > self.end_date:
-            schedule_end = self.end_date
+        schedule_ranges: list[tuple[Medication, datetime, int]] = []
+        for med in medications:
+            schedule_range = med._schedule_range(
+                now, now + delta, pending.get(med.id, 0)
+            )
+            if schedule_range is not None:
+                first, count = schedule_range
+                med.scheduled_until = first + (count - 1) * med.frequency
+                schedule_ranges.append((med, first, count))
+
+        if not schedule_ranges:
+            return 0
+
+        async with transaction():
+            if settings.SCHEDULE_GENERATION_SERVER_SIDE and is_postgres():
+                created = await MedicationSchedule.insert_series(
+                    [
+                        (med.id, first, med.scheduled_until, med.frequency, count)
+                        for med, first, count in schedule_ranges
+                    ]
+                )
+            else:
+                schedules_to_create = [
+                    MedicationSchedule(
+                        medication_id=med.id,
+                        scheduled_datetime=first + i * med.frequency,
+                        status=MedicationStatus.SCHEDULED,
+                    )
+                    for med, first, count in schedule_ranges
+                    for i in range(count)
+                ]
+                await MedicationSchedule.bulk_create(
+                    schedules_to_create,
+                    batch_size=settings.SCHEDULE_INSERT_BATCH_SIZE,
+                    ignore_conflicts=True,
+                )
+                created = len(schedules_to_create)
 
-        if self.start_date > schedule_end or current_datetime > schedule_end:
-            return
+            await Medication.bulk_update(
+                [med for med, _, _ in schedule_ranges],
+                fields=["scheduled_until"],
+                batch_size=settings.GENERATION_BATCH_SIZE,
+            )
 
-        schedules_to_create: list[MedicationSchedule] = []
+        for med, first, count in schedule_ranges:
+            due_timer.add(med.id, first, med.frequency, count)
 
-        while current_datetime <= schedule_end:
-            if (
-                self.total_doses is not None
-                and len(schedules_to_create) >= self.total_doses - self.doses_taken
-            ):
-                break
+        return created
 
-            schedules_to_create.append(
-                MedicationSchedule(
-                    medication=self,
-                    scheduled_datetime=current_datetime,
-                    status=MedicationStatus.SCHEDULED,
+    def _schedule_range(
+        self, now: datetime, schedule_end: datetime, pending: int
+    ) -> tuple[datetime, int] | None:
+        """
+        Returns the first datetime and the number of schedules to create up to
+        `schedule_end`, resuming after the `scheduled_until` watermark.
+        None if there is nothing to create.
+        """
+        if self.is_prn or not self.frequency:
+            return None
+
+        if self.scheduled_until is None:
+            current_datetime = now
+        else:
+            current_datetime = self.scheduled_until + self.frequency
+            if current_datetime < now:
+                # Keep the dosing times but do not create doses already overdue
+                current_datetime += (
+                    -((current_datetime - now) // self.frequency) * self.frequency
                 )
-            )
+        current_datetime = max(current_datetime, self.start_date)
 
-            current_datetime += self.frequency
+        if self.end_date is not None and schedule_end > self.end_date:
+            schedule_end = self.end_date
 
-        if schedules_to_create:
-            await MedicationSchedule.bulk_create(
-                schedules_to_create, ignore_conflicts=True
-            )
+        if current_datetime > schedule_end:
+            return None
+
+        count = (schedule_end - current_datetime) // self.frequency + 1
+        if self.total_doses is not None:
+            count = min(count, self.total_doses - self.doses_taken - pending)
+
+        if count <= 0:
+            return None
+
+        return current_datetime, count
 
     async def delete_future_schedules(self) -> None:
         """Delete all future medication schedules."""
+        now = utc_now()
         await self.schedules.filter(
-            scheduled_datetime__gt=datetime.now(ZoneInfo("UTC")),
+            scheduled_datetime__gt=now,
             status__in=[MedicationStatus.SCHEDULED, MedicationStatus.NOTIFIED],
         ).delete()
+        due_timer.discard(self.id, now)
+
+        if self.scheduled_until is not None and self.scheduled_until > now:
+            # Rewind the watermark to the last dose kept, on the same dosing times
+            self.scheduled_until -= (
+                -((now - self.scheduled_until) // self.frequency) * self.frequency
+            )
+            await self.save(update_fields=["scheduled_until"])
 
     async def handle_medication_intake(self, is_missed_dose: bool = False) -> None:
         """Handles medication intake."""
@@ -151,7 +247,7 @@ class Medication(Model):
             logger.info(f"Taking unscheduled medication: {self}")
             await MedicationLog.create(
                 medication=self,
-                taken_at=datetime.now(ZoneInfo("UTC")),
+                taken_at=utc_now(),
             )
         elif is_missed_dose:
             logger.info(f"Taking missed medication: {self} - {schedule}")
@@ -161,7 +257,7 @@ class Medication(Model):
             await schedule.handle_take_medication()
 
         self.doses_taken += 1
-        await self.save()
+        await self.save(update_fields=["doses_taken"])
         return
 
     def __str__(self) -> str:
@@ -26,4 +26,4 @@ class MedicationLog(Model):
     updated_at = fields.DatetimeField(auto_now=True)
 
     class Meta:
-        indexes = ("medication", "taken_at")
+        indexes = (("medication", "taken_at", "id"),)
@@ -1,16 +1,22 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta
+from collections import Counter
+from datetime import date, datetime, timedelta
 from enum import StrEnum
 from typing import TYPE_CHECKING
 from zoneinfo import ZoneInfo
 
 from pyttings import settings
-from tortoise import fields
+from tortoise import Tortoise, connections, fields
+from tortoise.expressions import F
 from tortoise.models import Model
 
+from app.database import is_postgres, transaction
 from app.logs import logger
+from app.models.daily_adherence import DailyAdherence
 from app.models.medication_log import MedicationLog
+from app.models.notification import Notification
+from app.utils.clock import utc_now
 
 if TYPE_CHECKING:
     from app.models.medication import Medication
@@ -25,6 +31,28 @@ class MedicationStatus(StrEnum):
     MISSED = "missed"  # Past grace period, not taken
 
 
+# Statuses a schedule ends in, the ones adherence is measured on
+SETTLED_STATUSES = (
+    MedicationStatus.TAKEN,
+    MedicationStatus.LATE_TAKEN,
+    MedicationStatus.SKIPPED,
+    MedicationStatus.MISSED,
+)
+
+
+def _owner_joins() -> str:
+    """
+    JOIN clauses from schedules, aliased s, to the users owning them, aliased u.
+    Models are looked up by name, as Medication and Person import this module.
+    """
+    models = Tortoise.apps["models"]
+    return f"""
+        JOIN "{models["Medication"]._meta.db_table}" m ON m."id" = s."medication_id"
+        JOIN "{models["Person"]._meta.db_table}" p ON p."id" = m."person_id"
+        JOIN "{models["User"]._meta.db_table}" u ON u."id" = p."user_id"
+    """
+
+
 class MedicationSchedule(Model):
     id = fields.IntField(primary_key=True)
     medication: fields.ForeignKeyRelation[Medication] = fields.ForeignKeyField(
@@ -36,6 +64,7 @@ class MedicationSchedule(Model):
     updated_at = fields.DatetimeField(auto_now=True)
 
     log: fields.ReverseRelation[MedicationLog]
+    notifications: fields.ReverseRelation[Notification]
 
     class Meta:
         indexes = (
@@ -48,44 +77,366 @@ class MedicationSchedule(Model):
     def in_grace_period(self) -> bool:
         """Returns True if the medication is within the grace period."""
         grace_period = timedelta(minutes=settings.MEDICATION_GRACE_PERIOD)
-        now = datetime.now(ZoneInfo("UTC"))
+        now = utc_now()
         return now - grace_period <= self.scheduled_datetime <= now + grace_period
 
+    @classmethod
+    async def bulk_transition(
+        cls,
+        from_status: MedicationStatus,
+        to_status: MedicationStatus,
+        due_before: datetime,
+        batch_size: int,
+        medication_ids: tuple[int, int | None] | None = None,
+    ) -> list[int]:
+        """
+        Move up to `batch_size` schedules due before `due_before` from one status
+        to another, oldest first. Returns the ids of the updated schedules.
+        `medication_ids` restricts the schedules to a [start, end) range of
+        medication ids, an open end when None, to split a sweep into shards.
+        Settled statuses are counted in the daily adherence rollup, so call it in
+        a transaction.
+        """
+        now = utc_now()
+        start, end = medication_ids or (None, None)
+
+        if is_postgres():
+            table = cls._meta.db_table
+            params = [to_status.value, now, from_status.value, due_before, batch_size]
+            shard_filter = ""
+            if start is not None:
+                params.append(start)
+                shard_filter += f' AND "medication_id" >= ${len(params)}'
+            if end is not None:
+                params.append(end)
+                shard_filter += f' AND "medication_id" < ${len(params)}'
+            rows = await connections.get("default").execute_query_dict(
+                f"""
+                UPDATE "{table}" SET "status" = $1, "updated_at" = $2
+                WHERE "id" IN (
+                    SELECT "id" FROM "{table}"
+                    WHERE "status" = $3 AND "scheduled_datetime" < $4{shard_filter}
+                    ORDER BY "scheduled_datetime"
+                    LIMIT $5
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING "id"
+                """,
+                params,
+            )
+            schedule_ids = [row["id"] for row in rows]
+        else:
+            query = cls.filter(status=from_status, scheduled_datetime__lt=due_before)
+            if start is not None:
+                query = query.filter(medication_id__gte=start)
+            if end is not None:
+                query = query.filter(medication_id__lt=end)
+            schedule_ids = [
+                row["id"]
+                for row in await query.order_by("scheduled_datetime")
+                .limit(batch_size)
+                .values("id")
+            ]
+            if schedule_ids:
+                await cls.filter(id__in=schedule_ids).update(
+                    status=to_status, updated_at=now
+                )
+
+        await cls.update_daily_adherence(schedule_ids, to_status, from_status)
+        return schedule_ids
+
+    @classmethod
+    async def insert_series(
+        cls, series: list[tuple[int, datetime, datetime, timedelta, int | None]]
+    ) -> int:
+        """
+        Postgres only. Create the schedules of each (medication id, first, last,
+        frequency, limit) series with generate_series in a single statement,
+        skipping existing ones. Returns the number of schedules created.
+        """
+        medication_ids, firsts, lasts, frequencies, limits = zip(*series, strict=True)
+        table = cls._meta.db_table
+        rows = await connections.get("default").execute_query_dict(
+            f"""
+            WITH "created" AS (
+                INSERT INTO "{table}"
+                    ("medication_id", "scheduled_datetime", "status",
+                     "created_at", "updated_at")
+                SELECT "series"."id", "occurrence", $6, $7, $7
+                FROM unnest($1::int[], $2::timestamptz[], $3::timestamptz[],
+                            $4::float8[], $5::int[])
+                    AS "series"("id", "first", "last", "seconds", "limit")
+                CROSS JOIN LATERAL (
+                    SELECT generate_series(
+                        "series"."first",
+                        "series"."last",
+                        make_interval(secs => "series"."seconds")
+                    ) AS "occurrence"
+                    LIMIT "series"."limit"
+                ) AS "occurrences"
+                ON CONFLICT ("medication_id", "scheduled_datetime") DO NOTHING
+                RETURNING 1
+            )
+            SELECT count(*) AS "count" FROM "created"
+            """,
+            [
+                list(medication_ids),
+                list(firsts),
+                list(lasts),
+                [frequency.total_seconds() for frequency in frequencies],
+                list(limits),
+                MedicationStatus.SCHEDULED.value,
+                utc_now(),
+            ],
+        )
+        return rows[0]["count"]
+
+    @classmethod
+    async def enqueue_notifications(cls, schedule_ids: list[int]) -> None:
+        """
+        Write the notifications of schedules moved to NOTIFIED to the outbox,
+        one per channel in NOTIFICATION_CHANNELS. Call it in the same transaction
+        as the status change, so both are committed or rolled back together.
+        Notifications are coalesced per user when they are claimed.
+        """
+        available_at = utc_now()
+        rows = await cls.filter(id__in=schedule_ids).values(
+            "id",
+            "scheduled_datetime",
+            "medication__name",
+            "medication__dosage",
+            "medication__person_id",
+            "medication__person__name",
+            "medication__person__user_id",
+            "medication__person__user__email",
+            "medication__person__user__phone_number",
+            "medication__person__user__timezone",
+        )
+        await Notification.bulk_create(
+            [
+                Notification(
+                    schedule_id=row["id"],
+                    user_id=row["medication__person__user_id"],
+                    channel=channel,
+                    payload={
+                        "schedule_id": row["id"],
+                        "scheduled_datetime": row["scheduled_datetime"].isoformat(),
+                        "medication": row["medication__name"],
+                        "dosage": row["medication__dosage"],
+                        "person_id": row["medication__person_id"],
+                        "person": row["medication__person__name"],
+                        "email": row["medication__person__user__email"],
+                        "phone_number": row["medication__person__user__phone_number"],
+                        "timezone": row["medication__person__user__timezone"],
+                    },
+                    available_at=available_at,
+                )
+                for row in rows
+                for channel in settings.NOTIFICATION_CHANNELS
+            ],
+            ignore_conflicts=True,
+        )
+
+    @classmethod
+    async def update_daily_adherence(
+        cls,
+        schedule_ids: list[int],
+        to_status: MedicationStatus,
+        from_status: MedicationStatus | None = None,
+    ) -> None:
+        """
+        Move the schedules from their `from_status` count to their `to_status`
+        count in the daily adherence rollup. Only settled statuses are counted.
+        Call it in the same transaction as the status change.
+        """
+        changes = [
+            (status, delta)
+            for status, delta in ((to_status, 1), (from_status, -1))
+            if status in SETTLED_STATUSES
+        ]
+        if not schedule_ids or not changes:
+            return
+
+        if is_postgres():
+            rollup = DailyAdherence._meta.db_table
+            await connections.get("default").execute_query(
+                f"""
+                INSERT INTO "{rollup}" ("medication_id", "day", "status", "count")
+                SELECT s."medication_id",
+                    (s."scheduled_datetime" AT TIME ZONE u."timezone")::date,
+                    "change"."status", sum("change"."delta")
+                FROM "{cls._meta.db_table}" s
+                {_owner_joins()}
+                CROSS JOIN unnest($2::varchar[], $3::int[])
+                    AS "change"("status", "delta")
+                WHERE s."id" = ANY($1::int[])
+                GROUP BY 1, 2, 3
+                ON CONFLICT ("medication_id", "day", "status")
+                DO UPDATE SET "count" = "{rollup}"."count" + EXCLUDED."count"
+                """,
+                [
+                    schedule_ids,
+                    [status.value for status, _ in changes],
+                    [delta for _, delta in changes],
+                ],
+            )
+            return
+
+        deltas: Counter[tuple[int, date, str]] = Counter()
+        for row in await cls.filter(id__in=schedule_ids).values(
+            "medication_id",
+            "scheduled_datetime",
+            "medication__person__user__timezone",
+        ):
+            day = (
+                row["scheduled_datetime"]
+                .astimezone(ZoneInfo(row["medication__person__user__timezone"]))
+                .date()
+            )
+            for status, delta in changes:
+                deltas[row["medication_id"], day, status.value] += delta
+        for (medication_id, day, counted), delta in deltas.items():
+            query = DailyAdherence.filter(
+                medication_id=medication_id, day=day, status=counted
+            )
+            if not await query.update(count=F("count") + delta):
+                await DailyAdherence.create(
+                    medication_id=medication_id, day=day, status=counted, count=delta
+                )
+
+    @classmethod
+    async def rebuild_daily_adherence(
+        cls, medication_ids: tuple[int, int | None] | None = None
+    ) -> int:
+        """
+        Recount the daily adherence rollup from the schedules, for a [start, end)
+        range of medication ids, an open end when None, or all medications.
+        Returns the number of rollup rows written.
+        """
+        start, end = medication_ids or (None, None)
+        rollup = DailyAdherence.filter()
+        schedules = cls.filter(status__in=SETTLED_STATUSES)
+        if start is not None:
+            rollup = rollup.filter(medication_id__gte=start)
+            schedules = schedules.filter(medication_id__gte=start)
+        if end is not None:
+            rollup = rollup.filter(medication_id__lt=end)
+            schedules = schedules.filter(medication_id__lt=end)
+
+        async with transaction():
+            await rollup.delete()
+            if is_postgres():
+                params: list = [[status.value for status in SETTLED_STATUSES]]
+                shard_filter = ""
+                if start is not None:
+                    params.append(start)
+                    shard_filter += f' AND s."medication_id" >= ${len(params)}'
+                if end is not None:
+                    params.append(end)
+                    shard_filter += f' AND s."medication_id" < ${len(params)}'
+                rows = await connections.get("default").execute_query_dict(
+                    f"""
+                    WITH "written" AS (
+                        INSERT INTO "{DailyAdherence._meta.db_table}"
+                            ("medication_id", "day", "status", "count")
+                        SELECT s."medication_id",
+                            (s."scheduled_datetime" AT TIME ZONE u."timezone")::date,
+                            s."status", count(*)
+                        FROM "{cls._meta.db_table}" s
+                        {_owner_joins()}
+                        WHERE s."status" = ANY($1::varchar[]){shard_filter}
+                        GROUP BY 1, 2, 3
+                        RETURNING 1
+                    )
+                    SELECT count(*) AS "count" FROM "written"
+                    """,
+                    params,
+                )
+                return rows[0]["count"]
+
+            counts: Counter[tuple[int, date, str]] = Counter()
+            for row in await schedules.values(
+                "medication_id",
+                "scheduled_datetime",
+                "status",
+                "medication__person__user__timezone",
+            ):
+                day = (
+                    row["scheduled_datetime"]
+                    .astimezone(ZoneInfo(row["medication__person__user__timezone"]))
+                    .date()
+                )
+                counts[row["medication_id"], day, str(row["status"])] += 1
+            await DailyAdherence.bulk_create(
+                [
+                    DailyAdherence(
+                        medication_id=medication_id, day=day, status=status, count=n
+                    )
+                    for (medication_id, day, status), n in counts.items()
+                ]
+            )
+            return len(counts)
+
+    async def _transition(self, to_status: MedicationStatus) -> bool:
+        """
+        Move the schedule from the status it was loaded with to `to_status` and
+        count it in the daily adherence rollup. If another transition changed
+        the status meanwhile, nothing is written, the current status is loaded
+        and False returned.
+        """
+        from_status = self.status
+        if not await MedicationSchedule.filter(id=self.id, status=from_status).update(
+            status=to_status, updated_at=utc_now()
+        ):
+            await self.refresh_from_db(fields=["status"])
+            return False
+        self.status = to_status
+        await MedicationSchedule.update_daily_adherence(
+            [self.id], to_status, from_status
+        )
+        return True
+
     async def handle_take_medication(self) -> None:
         logger.info(f"Taking medication: {self}")
-        await MedicationLog.create(
-            medication=self.medication,
-            schedule=self,
-            taken_at=datetime.now(ZoneInfo("UTC")),
-        )
-        self.status = MedicationStatus.TAKEN
-        await self.save()
+        async with transaction():
+            await MedicationLog.create(
+                medication=self.medication,
+                schedule=self,
+                taken_at=utc_now(),
+            )
+            if (
+                not await self._transition(MedicationStatus.TAKEN)
+                and self.status == MedicationStatus.MISSED
+            ):
+                # Marked missed by a sweep meanwhile
+                await self._transition(MedicationStatus.LATE_TAKEN)
 
     async def handle_late_taken(self) -> None:
         logger.info(f"Taking medication late: {self}")
-        await MedicationLog.create(
-            medication=self.medication,
-            schedule=self,
-            taken_at=datetime.now(ZoneInfo("UTC")),
-        )
-        self.status = MedicationStatus.LATE_TAKEN
-        await self.save()
+        async with transaction():
+            await MedicationLog.create(
+                medication=self.medication,
+                schedule=self,
+                taken_at=utc_now(),
+            )
+            await self._transition(MedicationStatus.LATE_TAKEN)
 
     async def handle_medication_notification(self) -> None:
         logger.info(f"Sending notification: {self}")
-        # TODO: send notification
-        self.status = MedicationStatus.NOTIFIED
-        await self.save()
+        async with transaction():
+            self.status = MedicationStatus.NOTIFIED
+            await self.save()
+            await MedicationSchedule.enqueue_notifications([self.id])
 
     async def handle_skipped(self) -> None:
         logger.info(f"Skipping medication: {self}")
-        self.status = MedicationStatus.SKIPPED
-        await self.save()
+        async with transaction():
+            await self._transition(MedicationStatus.SKIPPED)
 
     async def handle_missed_medication(self) -> None:
         logger.info(f"Missed medication: {self}")
-        self.status = MedicationStatus.MISSED
-        await self.save()
+        async with transaction():
+            await self._transition(MedicationStatus.MISSED)
 
     def __str__(self) -> str:
         return (
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from enum import StrEnum
+from typing import TYPE_CHECKING
+
+from pyttings import settings
+from tortoise import connections, fields
+from tortoise.expressions import Q
+from tortoise.functions import Min
+from tortoise.models import Model
+
+from app.database import is_postgres
+from app.utils.clock import utc_now
+
+if TYPE_CHECKING:
+    from app.models.medication_schedule import MedicationSchedule
+    from app.models.user import User
+
+
+class NotificationStatus(StrEnum):
+    PENDING = "pending"  # Waiting to be delivered
+    SENT = "sent"  # Delivered by its channel
+    FAILED = "failed"  # Gave up after NOTIFICATION_MAX_ATTEMPTS
+
+
+class Notification(Model):
+    """Outbox of notifications, written with the schedule status transition."""
+
+    id = fields.IntField(primary_key=True)
+    schedule: fields.ForeignKeyRelation[MedicationSchedule] = fields.ForeignKeyField(
+        "models.MedicationSchedule", related_name="notifications"
+    )
+    user: fields.ForeignKeyRelation[User] = fields.ForeignKeyField(
+        "models.User", related_name="notifications"
+    )
+    channel = fields.CharField(max_length=20)
+    payload: dict = fields.JSONField()
+    status = fields.CharEnumField(
+        NotificationStatus, default=NotificationStatus.PENDING
+    )
+    attempts = fields.IntField(default=0)
+    available_at = fields.DatetimeField()  # not delivered before
+    sent_at = fields.DatetimeField(null=True)
+    last_error = fields.TextField(null=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "notification_outbox"
+        unique_together = ("schedule", "channel")
+        indexes = (("status", "available_at"),)
+
+    @classmethod
+    async def claim(cls, batch_size: int) -> list[Notification]:
+        """
+        Claim the due notifications of up to `batch_size` users per channel.
+        A user's notifications are held until the oldest of them has waited
+        NOTIFICATION_COALESCE_WINDOW seconds, then all of them are claimed
+        together, so doses due close together are sent as one reminder.
+        Claimed notifications are hidden from other workers for
+        NOTIFICATION_DELIVERY_TIMEOUT seconds, after which a notification that
+        was neither sent nor failed becomes available again.
+        """
+        now = utc_now()
+        held_until = now - timedelta(seconds=settings.NOTIFICATION_COALESCE_WINDOW)
+        hidden_until = now + timedelta(seconds=settings.NOTIFICATION_DELIVERY_TIMEOUT)
+
+        if is_postgres():
+            table = cls._meta.db_table
+            rows = await connections.get("default").execute_query_dict(
+                f"""
+                UPDATE "{table}" SET "available_at" = $1, "updated_at" = $2
+                WHERE "id" IN (
+                    SELECT "id" FROM "{table}"
+                    WHERE "status" = $3 AND "available_at" <= $2
+                    AND ("user_id", "channel") IN (
+                        SELECT "user_id", "channel" FROM "{table}"
+                        WHERE "status" = $3 AND "available_at" <= $2
+                        GROUP BY "user_id", "channel"
+                        HAVING MIN("available_at") <= $5
+                        ORDER BY MIN("available_at")
+                        LIMIT $4
+                    )
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING "id"
+                """,
+                [
+                    hidden_until,
+                    now,
+                    NotificationStatus.PENDING.value,
+                    batch_size,
+                    held_until,
+                ],
+            )
+            notification_ids = [row["id"] for row in rows]
+        else:
+            groups = (
+                await cls.filter(
+                    status=NotificationStatus.PENDING, available_at__lte=now
+                )
+                .annotate(oldest=Min("available_at"))
+                .group_by("user_id", "channel")
+                .filter(oldest__lte=held_until)
+                .order_by("oldest")
+                .limit(batch_size)
+                .values("user_id", "channel")
+            )
+            if not groups:
+                return []
+            notification_ids = await cls.filter(
+                Q(*(Q(**group) for group in groups), join_type="OR"),
+                status=NotificationStatus.PENDING,
+                available_at__lte=now,
+            ).values_list("id", flat=True)
+            await cls.filter(id__in=notification_ids).update(
+                available_at=hidden_until, updated_at=now
+            )
+
+        if not notification_ids:
+            return []
+        return await cls.filter(id__in=notification_ids).order_by("id")
+
+    @classmethod
+    async def mark_sent(cls, notifications: list[Notification]) -> None:
+        now = utc_now()
+        await cls.filter(
+            id__in=[notification.id for notification in notifications]
+        ).update(status=NotificationStatus.SENT, sent_at=now, updated_at=now)
+
+    @classmethod
+    async def mark_failed(cls, notifications: list[Notification], error: str) -> None:
+        """Retry with exponential backoff, give up after NOTIFICATION_MAX_ATTEMPTS."""
+        now = utc_now()
+        for notification in notifications:
+            notification.attempts += 1
+            notification.last_error = error
+            if notification.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+                notification.status = NotificationStatus.FAILED
+            else:
+                notification.available_at = now + timedelta(
+                    seconds=settings.NOTIFICATION_RETRY_BACKOFF
+                    * 2 ** (notification.attempts - 1)
+                )
+            notification.updated_at = now
+
+        await cls.bulk_update(
+            notifications,
+            fields=["attempts", "last_error", "status", "available_at", "updated_at"],
+        )
+
+    def __str__(self) -> str:
+        return (
+            f"Notification(id={self.id}, channel={self.channel}, "
+            f"status={self.status}, attempts={self.attempts})"
+        )
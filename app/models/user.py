@@ -1,21 +1,32 @@
 from __future__ import annotations
 
 import contextlib
+import copy
+import hashlib
 import time
+from collections import Counter
 from typing import TYPE_CHECKING
 
 import jwt
-from argon2 import PasswordHasher
-from argon2.exceptions import VerificationError
 from pyttings import settings
-from tortoise import fields
+from redis.exceptions import RedisError
+from tortoise import BaseDBAsyncClient, fields
+from tortoise.expressions import F
 from tortoise.models import Model
+from tortoise.signals import post_delete, post_save
+
+from app.broadcast import broadcast
+from app.database import on_commit
+from app.logs import logger
+from app.passwords import PasswordsBusy, passwords
+from app.utils.cache import TTLCache
 
 if TYPE_CHECKING:
+    from app.models.notification import Notification
     from app.models.person import Person
     from app.models.token_blacklist import BlacklistedToken
 
-ph = PasswordHasher()
+CHANNEL = "user-changed"
 
 
 class User(Model):
@@ -27,11 +38,13 @@ class User(Model):
     birth_date = fields.DateField()
     timezone = fields.CharField(max_length=50, default="UTC")
     disabled = fields.BooleanField(default=False)
+    token_version = fields.IntField(default=0)  # tokens of older versions are revoked
     created_at = fields.DatetimeField(auto_now_add=True)
     updated_at = fields.DatetimeField(auto_now=True)
 
     persons: fields.ReverseRelation[Person]
     blacklisted_tokens: fields.ReverseRelation[BlacklistedToken]
+    notifications: fields.ReverseRelation[Notification]
 
     @classmethod
     async def register(cls, password: str, **kwargs) -> User:
@@ -41,10 +54,57 @@ class User(Model):
 
     @classmethod
     async def from_jwt(cls, token: str) -> User:
-        payload = jwt.decode(
-            token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM]
-        )
-        return await cls.get(id=payload["id"], email=payload["email"], disabled=False)
+        """
+        Get the enabled user of a token, from the cache of this process if it
+        holds it. Cached users are copied, so requests cannot alter them.
+        Raises InvalidTokenError if the token was revoked by `revoke_tokens`.
+        """
+        payload = decode_token(token)
+        version = payload.get("version", 0)
+        user = users.get(payload["id"])
+        if (
+            user is None
+            or user.email != payload["email"]
+            or user.token_version < version  # cached before a revocation
+        ):
+            user = await cls._fetch(payload["id"], payload["email"])
+        if user.token_version != version:
+            raise jwt.InvalidTokenError("Token revoked")
+        return copy.copy(user)
+
+    @classmethod
+    async def _fetch(cls, user_id: int, email: str) -> User:
+        """Get an enabled user, cached unless it is invalidated meanwhile."""
+        fetching[user_id] += 1
+        try:
+            user = await cls.get(id=user_id, email=email, disabled=False)
+        finally:
+            fetching[user_id] -= 1
+            invalidated = user_id in stale
+            if not fetching[user_id]:
+                del fetching[user_id]
+                stale.discard(user_id)
+        if not invalidated:
+            users.set(user_id, user)
+        return user
+
+    async def revoke_tokens(self) -> None:
+        """Revoke every token issued so far to the user."""
+        await User.filter(id=self.id).update(token_version=F("token_version") + 1)
+        await User.invalidate(self.id)
+
+    @staticmethod
+    async def invalidate(user_id: int) -> None:
+        """
+        Drop a user from the cache of every process. Saving or deleting a user
+        does it once committed, updates through a queryset must call it.
+        """
+        forget(user_id)
+        try:
+            await broadcast.publish(CHANNEL, str(user_id))
+        except RedisError:
+            # Other processes keep the user until it expires from their cache
+            logger.exception(f"Failed to broadcast the invalidation of user {user_id}")
 
     @property
     def access_token(self) -> str:
@@ -52,6 +112,7 @@ class User(Model):
             {
                 "email": self.email,
                 "id": self.id,
+                "version": self.token_version,
                 "exp": time.time() + settings.JWT_EXPIRATION,
             },
             settings.JWT_SECRET_KEY,
@@ -60,12 +121,76 @@ class User(Model):
 
     @staticmethod
     async def _hash_password(password: str) -> str:
-        return ph.hash(password)
+        return await passwords.hash(password)
 
     async def check_password(self, password: str) -> bool:
-        with contextlib.suppress(VerificationError):
-            return ph.verify(self.password, password)
-        return False
+        """
+        Verify the password, rehashing it if the hash was made with other cost
+        parameters than the current ones. The rehash is skipped while the
+        password pool is busy, and done on a later login.
+        """
+        if not await passwords.verify(self.password, password):
+            return False
+        if passwords.needs_rehash(self.password):
+            with contextlib.suppress(PasswordsBusy):
+                self.password = await self._hash_password(password)
+                await self.save(update_fields=["password"])
+        return True
 
     def __str__(self) -> str:
         return f"User(id={self.id}, email={self.email}, name={self.name})"
+
+
+# Enabled users by id, for the authentication of requests
+users: TTLCache[int, User] = TTLCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL)
+# Claims of verified tokens by digest, until the tokens expire
+claims: TTLCache[bytes, dict] = TTLCache(
+    settings.TOKEN_CACHE_SIZE, settings.JWT_EXPIRATION
+)
+# Fetches in flight by user id, and the users invalidated during them
+fetching: Counter[int] = Counter()
+stale: set[int] = set()
+
+
+def forget(user_id: int) -> None:
+    """Drop a user from the cache of this process, and from fetches in flight."""
+    users.pop(user_id)
+    if user_id in fetching:
+        stale.add(user_id)
+
+
+broadcast.subscribe(CHANNEL, lambda user_id: forget(int(user_id)))
+
+
+def decode_token(token: str) -> dict:
+    """
+    Verify a token and return its claims. A token is only verified the first
+    time, its claims are then cached until it expires.
+    """
+    digest = hashlib.sha256(token.encode()).digest()
+    payload = claims.get(digest)
+    if payload is None:
+        payload = jwt.decode(
+            token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM]
+        )
+        expires = payload.get("exp")
+        claims.set(digest, payload, None if expires is None else expires - time.time())
+    return payload
+
+
+@post_save(User)
+async def user_saved(
+    sender: type[User],
+    instance: User,
+    created: bool,
+    using_db: BaseDBAsyncClient | None,
+    update_fields: list[str],
+) -> None:
+    await on_commit(lambda: User.invalidate(instance.id))
+
+
+@post_delete(User)
+async def user_deleted(
+    sender: type[User], instance: User, using_db: BaseDBAsyncClient | None
+) -> None:
+    await on_commit(lambda: User.invalidate(instance.id))
@@ -0,0 +1,26 @@
+from app.notifications.channels import (
+    EmailChannel,
+    LogChannel,
+    LoopbackChannel,
+    NotificationChannel,
+    NotificationError,
+    WebhookChannel,
+)
+
+CHANNELS: dict[str, NotificationChannel] = {
+    channel.name: channel
+    for channel in (LogChannel(), LoopbackChannel(), WebhookChannel(), EmailChannel())
+}
+
+
+def register_channel(channel: NotificationChannel) -> None:
+    """Add or replace a delivery channel, e.g. a push provider."""
+    CHANNELS[channel.name] = channel
+
+
+__all__ = [
+    "CHANNELS",
+    "NotificationChannel",
+    "NotificationError",
+    "register_channel",
+]
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import smtplib
+import urllib.request
+from abc import ABC, abstractmethod
+from datetime import datetime
+from email.message import EmailMessage
+from zoneinfo import ZoneInfo
+
+from pyttings import settings
+
+from app.logs import logger
+from app.models.notification import Notification
+
+
+class NotificationError(Exception):
+    """Raised by a channel when a batch of notifications could not be sent."""
+
+
+def format_message(payloads: list[dict]) -> str:
+    """Human readable reminder for the doses of one person, in the user timezone."""
+    try:
+        doses = []
+        for payload in payloads:
+            scheduled_datetime = datetime.fromisoformat(payload["scheduled_datetime"])
+            local_time = scheduled_datetime.astimezone(ZoneInfo(payload["timezone"]))
+            doses.append(
+                f"{payload['medication']} ({payload['dosage']}) "
+                f"at {local_time:%Y-%m-%d %H:%M}"
+            )
+        return f"Time for {payloads[0]['person']} to take {', '.join(doses)}."
+    except (KeyError, ValueError) as e:
+        raise NotificationError(f"Invalid payload: {e!r}") from e
+
+
+class NotificationChannel(ABC):
+    """
+    Sends batches of up to `batch_size` messages. Each message is a group of
+    notifications for the same person, sent as one combined reminder.
+    """
+
+    name: str
+    batch_size: int = 100
+
+    @abstractmethod
+    async def send(self, groups: list[list[Notification]]) -> None:
+        """Send every message or raise NotificationError, nothing else."""
+
+
+class LogChannel(NotificationChannel):
+    name = "log"
+    batch_size = 1000
+
+    async def send(self, groups: list[list[Notification]]) -> None:
+        for group in groups:
+            ids = [notification.id for notification in group]
+            message = format_message([notification.payload for notification in group])
+            logger.info(f"Notifications {ids}: {message}")
+
+
+class LoopbackChannel(NotificationChannel):
+    """Keeps sent notifications in memory, for tests and local development."""
+
+    name = "loopback"
+
+    def __init__(self) -> None:
+        self.sent: dict[int, dict] = {}
+        self.messages: list[str] = []
+
+    async def send(self, groups: list[list[Notification]]) -> None:
+        for group in groups:
+            if all(notification.id in self.sent for notification in group):
+                continue
+            for notification in group:
+                self.sent[notification.id] = notification.payload
+            self.messages.append(
+                format_message([notification.payload for notification in group])
+            )
+
+
+class WebhookChannel(NotificationChannel):
+    """
+    POSTs each batch as a JSON list of messages to NOTIFICATION_WEBHOOK_URL, e.g.
+    a push or SMS gateway. The Idempotency-Key header lets the receiver drop
+    retried batches.
+    """
+
+    name = "webhook"
+
+    async def send(self, groups: list[list[Notification]]) -> None:
+        if not settings.NOTIFICATION_WEBHOOK_URL:
+            raise NotificationError("NOTIFICATION_WEBHOOK_URL is not set")
+
+        try:
+            ids = ",".join(
+                str(notification.id) for group in groups for notification in group
+            )
+            request = urllib.request.Request(
+                settings.NOTIFICATION_WEBHOOK_URL,
+                data=json.dumps(
+                    [
+                        {
+                            "ids": [notification.id for notification in group],
+                            "message": format_message(
+                                [notification.payload for notification in group]
+                            ),
+                            "email": group[0].payload["email"],
+                            "phone_number": group[0].payload["phone_number"],
+                            "doses": [notification.payload for notification in group],
+                        }
+                        for group in groups
+                    ]
+                ).encode(),
+                headers={
+                    "Content-Type": "application/json",
+                    "Idempotency-Key": hashlib.sha256(ids.encode()).hexdigest(),
+                },
+                method="POST",
+            )
+            await asyncio.to_thread(self._post, request)
+        except (KeyError, OSError, ValueError) as e:
+            raise NotificationError(f"Webhook failed: {e!r}") from e
+
+    @staticmethod
+    def _post(request: urllib.request.Request) -> None:
+        with urllib.request.urlopen(
+            request, timeout=settings.NOTIFICATION_WEBHOOK_TIMEOUT
+        ):
+            pass
+
+
+class EmailChannel(NotificationChannel):
+    """Sends one e-mail per message over a single SMTP connection per batch."""
+
+    name = "email"
+    batch_size = 50
+
+    async def send(self, groups: list[list[Notification]]) -> None:
+        if not settings.SMTP_HOST:
+            raise NotificationError("SMTP_HOST is not set")
+        try:
+            await asyncio.to_thread(self._send, groups)
+        except (KeyError, OSError, ValueError) as e:
+            raise NotificationError(f"SMTP failed: {e!r}") from e
+
+    @staticmethod
+    def _send(groups: list[list[Notification]]) -> None:
+        with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as smtp:
+            smtp.starttls()
+            if settings.SMTP_USERNAME:
+                smtp.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
+            for group in groups:
+                payloads = [notification.payload for notification in group]
+                message = EmailMessage()
+                message["From"] = settings.SMTP_SENDER
+                message["To"] = payloads[0]["email"]
+                medications = ", ".join(payload["medication"] for payload in payloads)
+                message["Subject"] = f"Remedi: {medications}"
+                message["Message-ID"] = f"<notification-{group[0].id}@remedi>"
+                message.set_content(format_message(payloads))
+                smtp.send_message(message)
@@ -0,0 +1,67 @@
+from collections import defaultdict
+
+from pyttings import settings
+
+from app.dispatcher import Dispatcher
+from app.logs import logger
+from app.models.notification import Notification
+from app.notifications.channels import NotificationChannel, NotificationError
+
+
+async def deliver_notifications(
+    dispatcher: Dispatcher, channels: dict[str, NotificationChannel]
+) -> int:
+    """
+    Claim due notifications from the outbox, group them per channel and person
+    into combined reminders, and submit them to the dispatcher in batches of
+    each channel's batch size.
+    Returns the number of claimed notifications.
+    """
+    notifications = await Notification.claim(settings.NOTIFICATION_DELIVERY_BATCH_SIZE)
+
+    by_channel: dict[str, list[Notification]] = defaultdict(list)
+    for notification in notifications:
+        by_channel[notification.channel].append(notification)
+
+    for name, channel_notifications in by_channel.items():
+        channel = channels.get(name)
+        if channel is None:
+            await Notification.mark_failed(
+                channel_notifications, f"Unknown channel: {name}"
+            )
+            continue
+
+        groups = group_by_person(channel_notifications)
+        for i in range(0, len(groups), channel.batch_size):
+            await dispatcher.submit(
+                send_batch, channel, groups[i : i + channel.batch_size]
+            )
+
+    return len(notifications)
+
+
+def group_by_person(notifications: list[Notification]) -> list[list[Notification]]:
+    """Group notifications of the same person, in due order."""
+    groups: dict[int, list[Notification]] = defaultdict(list)
+    for notification in notifications:
+        groups[notification.payload["person_id"]].append(notification)
+    return [
+        sorted(group, key=lambda n: n.payload["scheduled_datetime"])
+        for group in groups.values()
+    ]
+
+
+async def send_batch(
+    channel: NotificationChannel, groups: list[list[Notification]]
+) -> None:
+    """Send a batch through its channel and record the outcome in the outbox."""
+    notifications = [notification for group in groups for notification in group]
+    try:
+        await channel.send(groups)
+    except NotificationError as e:
+        logger.exception(
+            f"Failed to send {len(notifications)} {channel.name} notifications"
+        )
+        await Notification.mark_failed(notifications, str(e))
+    else:
+        await Notification.mark_sent(notifications)
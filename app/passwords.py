@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypeVar
+
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError
+from pyttings import settings
+
+T = TypeVar("T")
+
+
+class PasswordsBusy(Exception):
+    """Raised when too many passwords are waiting to be hashed."""
+
+
+class PasswordPool:
+    """
+    Hashes and verifies passwords with Argon2 on a pool of `workers` threads,
+    so that the event loop keeps serving other requests meanwhile. Up to
+    `max_waiting` calls wait for a free thread, later ones raise PasswordsBusy.
+    """
+
+    def __init__(self, hasher: PasswordHasher, workers: int, max_waiting: int):
+        self.hasher = hasher
+        self.limit = workers + max_waiting
+        self.pending = 0  # running and waiting calls
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="argon2")
+
+    async def _run(self, func: Callable[..., T], *args: str) -> T:
+        if self.pending >= self.limit:
+            raise PasswordsBusy
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, func, *args
+            )
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.hasher.hash, password)
+
+    async def verify(self, password_hash: str, password: str) -> bool:
+        try:
+            return await self._run(self.hasher.verify, password_hash, password)
+        except VerificationError:
+            return False
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """Whether the hash was made with other cost parameters than the current."""
+        return self.hasher.check_needs_rehash(password_hash)
+
+
+def get_hasher() -> PasswordHasher:
+    return PasswordHasher(
+        time_cost=settings.PASSWORD_HASH_TIME_COST,
+        memory_cost=settings.PASSWORD_HASH_MEMORY_COST,
+        parallelism=settings.PASSWORD_HASH_PARALLELISM,
+    )
+
+
+passwords = PasswordPool(
+    get_hasher(), settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_WAITING
+)
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import time
+from abc import ABC, abstractmethod
+
+import jwt
+from pyttings import settings
+from redis.asyncio import Redis
+
+from app.models.token_blacklist import BlacklistedToken
+from app.models.user import User
+
+PREFIX = "revoked-token:"
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TokenStore(ABC):
+    """Keeps revoked tokens until they expire."""
+
+    @abstractmethod
+    async def add(self, token: str, user: User, reason: str) -> None:
+        """Revoke a token. Token must be a valid JWT token."""
+
+    @abstractmethod
+    async def contains(self, token: str) -> bool:
+        pass
+
+
+class DatabaseTokenStore(TokenStore):
+    """Revoked tokens in the blacklisted_tokens table, cleaned up every night."""
+
+    async def add(self, token: str, user: User, reason: str) -> None:
+        await BlacklistedToken.blacklist_token(token, user, reason)
+
+    async def contains(self, token: str) -> bool:
+        return await BlacklistedToken.is_token_blacklisted(token)
+
+
+class RedisTokenStore(TokenStore):
+    """
+    Revoked tokens as Redis keys that expire with the token, so they never
+    need to be cleaned up.
+    """
+
+    def __init__(self) -> None:
+        self.redis = Redis(
+            host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=settings.REDIS_DB
+        )
+
+    async def add(self, token: str, user: User, reason: str) -> None:
+        payload = jwt.decode(
+            token,
+            settings.JWT_SECRET_KEY,
+            algorithms=[settings.JWT_ALGORITHM],
+            options={"verify_exp": False},
+        )
+        await self.redis.set(
+            f"{PREFIX}{hash_token(token)}",
+            f"{user.id}:{reason}",
+            exat=math.ceil(payload.get("exp", time.time())),
+        )
+
+    async def contains(self, token: str) -> bool:
+        return bool(await self.redis.exists(f"{PREFIX}{hash_token(token)}"))
+
+
+def get_token_store() -> TokenStore:
+    if settings.TOKEN_REVOCATION_BACKEND == "redis":
+        return RedisTokenStore()
+    return DatabaseTokenStore()
+
+
+tokens = get_token_store()
+
+
+async def revoke_token(token: str, user: User, reason: str = "logout") -> None:
+    """Revoke a token in the store set by TOKEN_REVOCATION_BACKEND."""
+    await tokens.add(token, user, reason)
+
+
+async def is_token_revoked(token: str) -> bool:
+    return await tokens.contains(token)
@@ -4,8 +4,8 @@ from pyttings import settings
 
 from app.auth import get_user, security
 from app.logs import logger
-from app.models.token_blacklist import BlacklistedToken
 from app.models.user import User
+from app.revocation import is_token_revoked, revoke_token
 from app.schemas.user import UserLoginSchema, UserSchema
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -42,13 +42,20 @@ async def login(user_model: UserLoginSchema) -> dict:
 @router.post("/logout")
 async def logout(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """Logout endpoint, requires a valid JWT."""
-    if await BlacklistedToken.is_token_blacklisted(credentials.credentials):
+    if await is_token_revoked(credentials.credentials):
         logger.error(
             f"Attempted logout with blacklisted token: {credentials.credentials}"
         )
         raise HTTPException(status_code=401, detail="Logout error")
 
     current_user: User = await get_user(credentials)
-    await BlacklistedToken.blacklist_token(credentials.credentials, current_user)
+    await revoke_token(credentials.credentials, current_user)
 
     return {"message": f"User {current_user.email} logged out successfully"}
+
+
+@router.post("/logout-all")
+async def logout_all(current_user: User = Depends(get_user)) -> dict:
+    """Logout endpoint that revokes every token of the user, this one included."""
+    await current_user.revoke_tokens()
+    return {"message": f"User {current_user.email} logged out of every session"}
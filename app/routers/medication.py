@@ -1,12 +1,11 @@
-from datetime import datetime, timedelta
+from datetime import timedelta
 from typing import Annotated
-from zoneinfo import ZoneInfo
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from tortoise.exceptions import DoesNotExist, IntegrityError
-from tortoise.transactions import in_transaction
 
 from app.auth import get_user
+from app.database import transaction
 from app.logs import logger
 from app.models.medication import Medication
 from app.models.person import Person
@@ -17,6 +16,7 @@ from app.schemas.medication import (
     MedicationRegisterSchema,
     MedicationSchema,
 )
+from app.utils.clock import utc_now
 from app.utils.date import to_utc
 
 router = APIRouter(prefix="/medications", tags=["medications"])
@@ -51,15 +51,13 @@ async def create_medication(
                 status_code=400, detail="End date must be after start date"
             )
 
-    if medication_model.start_date < datetime.now(ZoneInfo("UTC")) - timedelta(
-        minutes=1
-    ):
+    if medication_model.start_date < utc_now() - timedelta(minutes=1):
         raise HTTPException(status_code=400, detail="Start date must be in the future")
 
     logger.info(f"Registering medication: {medication_model}")
 
     try:
-        async with in_transaction():
+        async with transaction():
             medication = await Medication.create(
                 person=person, **medication_model.model_dump(exclude_unset=True)
             )
@@ -175,7 +173,7 @@ async def disable_medication(medication_id: int, user: User = Depends(get_user))
     except DoesNotExist:
         raise MedicationException
     medication.is_active = False
-    await medication.save()
+    await medication.save(update_fields=["is_active"])
     await medication.delete_future_schedules()
     return {"message": "Medication disabled successfully"}
 
@@ -190,6 +188,6 @@ async def enable_medication(medication_id: int, user: User = Depends(get_user)):
     except DoesNotExist:
         raise MedicationException
     medication.is_active = True
-    await medication.save()
+    await medication.save(update_fields=["is_active"])
     await medication.generate_schedules()
     return {"message": "Medication enabled successfully"}
@@ -1,15 +1,49 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import csv
+import io
+import json
+from collections.abc import AsyncIterator
+from datetime import datetime
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from pyttings import settings
 from tortoise.exceptions import DoesNotExist
+from tortoise.expressions import Q
+from tortoise.queryset import QuerySet
 
 from app.auth import get_user
 from app.models.medication import Medication
 from app.models.medication_log import MedicationLog
+from app.models.person import Person
 from app.models.user import User
 from app.routers.medication import MedicationException
-from app.schemas.medication_log import MedicationLogSchema, MedicationLogsSchema
+from app.routers.person import PersonException
+from app.schemas.medication_log import (
+    ExportFormat,
+    MedicationLogSchema,
+    MedicationLogsSchema,
+)
+from app.utils.date import to_utc
+from app.utils.pagination import decode_cursor, encode_cursor
 
 router = APIRouter(prefix="/medication-logs", tags=["medication-logs"])
 
+# Exported column: MedicationLog field it is read from
+EXPORT_FIELDS = {
+    "log_id": "id",
+    "taken_at": "taken_at",
+    "person_id": "medication__person_id",
+    "person": "medication__person__name",
+    "medication_id": "medication_id",
+    "medication": "medication__name",
+    "dosage": "medication__dosage",
+    "schedule_id": "schedule_id",
+    "scheduled_datetime": "schedule__scheduled_datetime",
+    "status": "schedule__status",
+    "notes": "notes",
+}
+
 
 class MedicationLogException(HTTPException):
     def __init__(self):
@@ -18,31 +52,180 @@ class MedicationLogException(HTTPException):
         )
 
 
+class LogsPage:
+    """Query parameters of a page of logs, newest first."""
+
+    def __init__(
+        self,
+        since: Annotated[
+            datetime | None, Query(description="Logs taken at or after")
+        ] = None,
+        until: Annotated[
+            datetime | None, Query(description="Logs taken before")
+        ] = None,
+        cursor: Annotated[
+            str | None, Query(description="X-Next-Cursor of the previous page")
+        ] = None,
+        limit: Annotated[
+            int, Query(ge=1, le=settings.MAX_PAGE_SIZE, description="Page size")
+        ] = settings.PAGE_SIZE,
+    ):
+        self.since = since
+        self.until = until
+        self.cursor = cursor
+        self.limit = limit
+
+    async def fetch(
+        self, query: QuerySet[MedicationLog], user: User, response: Response
+    ) -> list[MedicationLog]:
+        """
+        Fetch the page with a keyset on (taken_at, id), so that every page is
+        an index range scan. The cursor of the next page, if any, is set in the
+        X-Next-Cursor header.
+        """
+        if self.since is not None:
+            query = query.filter(taken_at__gte=to_utc(self.since, user.timezone))
+        if self.until is not None:
+            query = query.filter(taken_at__lt=to_utc(self.until, user.timezone))
+        if self.cursor is not None:
+            try:
+                taken_at, log_id = decode_cursor(self.cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            query = query.filter(
+                Q(taken_at__lt=taken_at) | Q(taken_at=taken_at, id__lt=log_id)
+            )
+
+        logs = (
+            await query.order_by("-taken_at", "-id")
+            .limit(self.limit + 1)
+            .prefetch_related("schedule")
+        )
+        if len(logs) > self.limit:
+            logs = logs[: self.limit]
+            response.headers["X-Next-Cursor"] = encode_cursor(
+                logs[-1].taken_at, logs[-1].id
+            )
+        return logs
+
+
 @router.get("/", response_model=list[MedicationLogSchema])
-async def get_medication_logs(user: User = Depends(get_user)):
-    """Get all medication logs for the current user"""
-    logs = await MedicationLog.filter(medication__person__user=user).prefetch_related(
-        "schedule"
+async def get_medication_logs(
+    response: Response,
+    page: LogsPage = Depends(),
+    user: User = Depends(get_user),
+):
+    """Get a page of medication logs for the current user, newest first"""
+    logs = await page.fetch(
+        MedicationLog.filter(medication__person__user=user), user, response
     )
-    if not logs:
+    if not logs and page.cursor is None:
         raise MedicationLogException
     return logs
 
 
 @router.get("/medication/{medication_id}", response_model=MedicationLogsSchema)
 async def get_medication_logs_by_medication_id(
-    medication_id: int, user: User = Depends(get_user)
+    medication_id: int,
+    response: Response,
+    page: LogsPage = Depends(),
+    user: User = Depends(get_user),
 ):
-    """Get all medication logs for a specific medication for the current user"""
+    """
+    Get a page of medication logs for a specific medication for the current user,
+    newest first
+    """
     try:
         medication = await Medication.get(
             person__user=user, id=medication_id
         ).prefetch_related("person")
     except DoesNotExist:
         raise MedicationException
-    logs = await MedicationLog.filter(medication=medication).prefetch_related(
-        "schedule", "medication__person"
-    )
-    if not logs:
+    logs = await page.fetch(MedicationLog.filter(medication=medication), user, response)
+    if not logs and page.cursor is None:
         raise MedicationLogException
     return {"medication": medication, "logs": logs}
+
+
+async def export_logs(
+    query: QuerySet[MedicationLog], export_format: ExportFormat
+) -> AsyncIterator[str]:
+    """
+    Yield the logs oldest first, one chunk of EXPORT_CHUNK_SIZE rows at a time.
+    Chunks are read with a keyset on (taken_at, id), so memory stays flat and
+    no connection is held between chunks.
+    """
+    chunk_size = settings.EXPORT_CHUNK_SIZE
+    if export_format == ExportFormat.CSV:
+        yield ",".join(EXPORT_FIELDS) + "\r\n"
+
+    last: tuple[datetime, int] | None = None
+    while True:
+        chunk_query = query
+        if last is not None:
+            taken_at, log_id = last
+            chunk_query = query.filter(
+                Q(taken_at__gt=taken_at) | Q(taken_at=taken_at, id__gt=log_id)
+            )
+        rows = (
+            await chunk_query.order_by("taken_at", "id")
+            .limit(chunk_size)
+            .values(**EXPORT_FIELDS)
+        )
+        if not rows:
+            return
+
+        output = io.StringIO()
+        if export_format == ExportFormat.CSV:
+            writer = csv.writer(output)
+            writer.writerows(
+                [
+                    value.isoformat() if isinstance(value, datetime) else value
+                    for value in row.values()
+                ]
+                for row in rows
+            )
+        else:
+            for row in rows:
+                output.write(json.dumps(row, default=str) + "\n")
+        yield output.getvalue()
+
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1]["taken_at"], rows[-1]["log_id"]
+
+
+@router.get("/export")
+async def export_medication_logs(
+    person_id: Annotated[int | None, Query(description="Filter by person ID")] = None,
+    medication_id: Annotated[
+        int | None, Query(description="Filter by medication ID")
+    ] = None,
+    export_format: Annotated[
+        ExportFormat, Query(alias="format", description="ndjson or csv")
+    ] = ExportFormat.NDJSON,
+    user: User = Depends(get_user),
+):
+    """Stream the full medication history of the current user, oldest first"""
+    query = MedicationLog.filter(medication__person__user=user)
+    if person_id is not None:
+        if not await Person.exists(user=user, id=person_id):
+            raise PersonException
+        query = query.filter(medication__person_id=person_id)
+    if medication_id is not None:
+        if not await Medication.exists(person__user=user, id=medication_id):
+            raise MedicationException
+        query = query.filter(medication_id=medication_id)
+
+    media_type = (
+        "text/csv" if export_format == ExportFormat.CSV else "application/x-ndjson"
+    )
+    return StreamingResponse(
+        export_logs(query, export_format),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="medication-logs.{export_format}"'
+            )
+        },
+    )
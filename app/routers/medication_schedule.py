@@ -1,25 +1,107 @@
-from collections import defaultdict
-from datetime import datetime, timedelta
+from collections import Counter, defaultdict
+from datetime import date, datetime, time, timedelta
 from typing import Annotated
 from zoneinfo import ZoneInfo
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pyttings import settings
 from tortoise.exceptions import DoesNotExist
+from tortoise.query_utils import Prefetch
+from tortoise.queryset import QuerySet
 
 from app.auth import get_user
+from app.models.daily_adherence import DailyAdherence
 from app.models.medication import Medication
-from app.models.medication_schedule import MedicationSchedule
+from app.models.medication_schedule import MedicationSchedule, MedicationStatus
 from app.models.user import User
 from app.routers.medication import MedicationException
+from app.schemas.adherence import AdherenceReportSchema
 from app.schemas.medication_schedule import (
     MedicationScheduleSchema,
     MedicationSchedulesSchema,
 )
+from app.utils.clock import utc_now
+from app.utils.date import Period, to_utc
 
 router = APIRouter(prefix="/medication-schedules", tags=["medication-schedules"])
 
 
+class DateWindow:
+    """
+    Query parameters of a window of dates. Defaults to today, in the user
+    timezone, plus and minus SCHEDULES_WINDOW_DAYS days.
+    """
+
+    def __init__(
+        self,
+        from_: Annotated[
+            datetime | None,
+            Query(alias="from", description="Schedules at or after"),
+        ] = None,
+        to: Annotated[datetime | None, Query(description="Schedules before")] = None,
+    ):
+        self.from_ = from_
+        self.to = to
+
+    def bounds(self, user: User) -> tuple[datetime, datetime]:
+        today = (
+            utc_now()
+            .astimezone(ZoneInfo(user.timezone))
+            .replace(hour=0, minute=0, second=0, microsecond=0)
+        )
+        days = timedelta(days=settings.SCHEDULES_WINDOW_DAYS)
+        from_ = (
+            today - days if self.from_ is None else to_utc(self.from_, user.timezone)
+        )
+        to = (
+            today + days + timedelta(days=1)
+            if self.to is None
+            else to_utc(self.to, user.timezone)
+        )
+        if to <= from_:
+            raise HTTPException(
+                status_code=400, detail="End of the window must be after its start"
+            )
+        return from_, to
+
+
+class ScheduleWindow(DateWindow):
+    """A window of schedules, optionally of some statuses only."""
+
+    def __init__(
+        self,
+        from_: Annotated[
+            datetime | None,
+            Query(alias="from", description="Schedules at or after"),
+        ] = None,
+        to: Annotated[datetime | None, Query(description="Schedules before")] = None,
+        status: Annotated[
+            list[MedicationStatus] | None, Query(description="Filter by status")
+        ] = None,
+    ):
+        super().__init__(from_, to)
+        self.status = status
+
+    def schedules(self, user: User) -> QuerySet[MedicationSchedule]:
+        from_, to = self.bounds(user)
+        query = MedicationSchedule.filter(
+            scheduled_datetime__gte=from_, scheduled_datetime__lt=to
+        )
+        if self.status:
+            query = query.filter(status__in=self.status)
+        return query.order_by("scheduled_datetime")
+
+
+def _adherence(periods: dict[date, Counter[str]]) -> dict:
+    """Status counts in total and per period, from the counts per period."""
+    return {
+        **sum(periods.values(), Counter()),
+        "periods": [
+            {"period": period, **counts} for period, counts in sorted(periods.items())
+        ],
+    }
+
+
 @router.get("/", response_model=list[MedicationSchedulesSchema])
 async def get_medications_schedules(
     medication_id: Annotated[
@@ -35,9 +117,10 @@ async def get_medications_schedules(
     limit: Annotated[
         int, Query(ge=1, le=1000, description="Maximum number of results")
     ] = 100,
+    window: ScheduleWindow = Depends(),
     user: User = Depends(get_user),
 ):
-    """Retrieve medication schedules with optional filtering."""
+    """Retrieve medication schedules in a window with optional filtering."""
     query = Medication.filter(person__user=user)
 
     if medication_id is not None:
@@ -54,7 +137,9 @@ async def get_medications_schedules(
         {"medication": medication, "schedules": list(medication.schedules)}
         for medication in await query.filter(is_active=True)
         .limit(limit)
-        .prefetch_related("schedules", "person")
+        .prefetch_related(
+            Prefetch("schedules", queryset=window.schedules(user)), "person"
+        )
     ]
 
 
@@ -74,7 +159,7 @@ async def get_medications_schedules_now(
 ):
     """Retrieve medication schedules within the grace period with optional filtering."""
     grace_period = timedelta(minutes=settings.MEDICATION_GRACE_PERIOD)
-    now = datetime.now(ZoneInfo("UTC"))
+    now = utc_now()
     query = MedicationSchedule.filter(
         medication__person__user=user,
         medication__is_prn=False,
@@ -105,16 +190,86 @@ async def get_medications_schedules_now(
     ]
 
 
+@router.get("/adherence", response_model=AdherenceReportSchema)
+async def get_adherence(
+    medication_id: Annotated[
+        int | None, Query(description="Filter by medication ID")
+    ] = None,
+    person_id: Annotated[int | None, Query(description="Filter by person ID")] = None,
+    period: Annotated[
+        Period, Query(description="Break the counts down by day, week or month")
+    ] = Period.DAY,
+    window: DateWindow = Depends(),
+    user: User = Depends(get_user),
+):
+    """
+    Count the taken, late taken, skipped and missed doses in a window, with the
+    adherence percentage, per medication and per person. Counts are read from
+    the daily adherence rollup, so the window is widened to whole days in the
+    user timezone.
+    """
+    local_tz = ZoneInfo(user.timezone)
+    from_, to = window.bounds(user)
+    first_day = from_.astimezone(local_tz).date()
+    last = to.astimezone(local_tz)
+    end_day = last.date() if last.time() == time() else last.date() + timedelta(days=1)
+
+    query = Medication.filter(person__user=user)
+    if medication_id is not None:
+        query = query.filter(id=medication_id)
+    if person_id is not None:
+        query = query.filter(person__id=person_id)
+    medications = await query.order_by("id").values(
+        "id", "name", "person_id", "person__name"
+    )
+
+    by_medication: dict[int, dict[date, Counter[str]]] = defaultdict(
+        lambda: defaultdict(Counter)
+    )
+    for row in await DailyAdherence.count_by_period(
+        [medication["id"] for medication in medications], first_day, end_day, period
+    ):
+        counts = by_medication[row["medication_id"]][row["period"]]
+        counts[row["status"]] += row["count"]
+
+    by_person: dict[int, dict[date, Counter[str]]] = defaultdict(
+        lambda: defaultdict(Counter)
+    )
+    persons: dict[int, str] = {}
+    for medication in medications:
+        persons[medication["person_id"]] = medication["person__name"]
+        for period_start, counts in by_medication[medication["id"]].items():
+            by_person[medication["person_id"]][period_start].update(counts)
+
+    return {
+        "from_": datetime.combine(first_day, time(), local_tz),
+        "to": datetime.combine(end_day, time(), local_tz),
+        "period": period,
+        "persons": [
+            {"person_id": person, "name": name, **_adherence(by_person[person])}
+            for person, name in persons.items()
+        ],
+        "medications": [
+            {
+                "medication_id": medication["id"],
+                "name": medication["name"],
+                "person_id": medication["person_id"],
+                **_adherence(by_medication[medication["id"]]),
+            }
+            for medication in medications
+        ],
+    }
+
+
 @router.get("/{medication_id}", response_model=list[MedicationScheduleSchema])
 async def get_medication_schedule_by_id(
     medication_id: int,
+    window: ScheduleWindow = Depends(),
     user: User = Depends(get_user),
 ):
-    """Retrieve a specific medication schedule by medication ID."""
+    """Retrieve the schedules of a medication, by medication ID, in a window."""
     try:
-        medication = await Medication.get(
-            person__user=user, id=medication_id
-        ).prefetch_related("schedules")
-        return medication.schedules
+        medication = await Medication.get(person__user=user, id=medication_id)
     except DoesNotExist:
         raise MedicationException
+    return await window.schedules(user).filter(medication=medication)
@@ -1,16 +1,28 @@
 import asyncio
-from datetime import datetime, timedelta
-from zoneinfo import ZoneInfo
+import random
+import signal
+from collections.abc import Awaitable, Callable
+from datetime import timedelta
 
 from apscheduler.jobstores.redis import RedisJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from pyttings import settings
 from tortoise.expressions import Q
 
+from app.database import close_db, init_db, transaction
+from app.dispatcher import Dispatcher
+from app.lease import LeaseLost, get_lease_backend, leased
 from app.logs import logger
 from app.models.medication import Medication
 from app.models.medication_schedule import MedicationSchedule, MedicationStatus
 from app.models.token_blacklist import BlacklistedToken
+from app.notifications import CHANNELS
+from app.notifications.delivery import deliver_notifications
+from app.timer import due_timer
+from app.utils.clock import utc_now
+
+# Share of its interval a job keeps its lease for, short of the next tick
+LEASE_HOLD = 0.9
 
 
 class Scheduler:
@@ -24,32 +36,60 @@ class Scheduler:
                 )
             }
         )
+        self.dispatcher = Dispatcher(
+            concurrency=settings.DISPATCHER_CONCURRENCY,
+            max_queue_size=settings.DISPATCHER_QUEUE_SIZE,
+        )
+        self.leases = get_lease_backend()
 
     def start(self) -> None:
+        self.dispatcher.start()
         self.scheduler.add_job(
-            self.generate_medication_reminders,
+            self.run_leased,
             "interval",
+            args=["generate_medication_reminders", self.generate_medication_reminders],
+            kwargs={"interval": settings.REMINDER_GENERATION_INTERVAL * 3600},
             hours=settings.REMINDER_GENERATION_INTERVAL,
             id="generate_medication_reminders",
             replace_existing=True,
         )
+        if settings.DUE_TIMER_ENABLED:
+            due_timer.start(self.check_due_schedules)
+            self.scheduler.add_job(
+                self.check_due_backstop,
+                "interval",
+                minutes=settings.DUE_TIMER_BACKSTOP_INTERVAL,
+                id="check_medication_schedules",
+                replace_existing=True,
+            )
+        else:
+            self.scheduler.add_job(
+                self.check_due_schedules,
+                "interval",
+                minutes=settings.REMINDER_CHECK_INTERVAL,
+                id="check_medication_schedules",
+                replace_existing=True,
+            )
         self.scheduler.add_job(
-            self.check_medication_schedules,
+            self.deliver_notifications,
             "interval",
-            minutes=settings.REMINDER_CHECK_INTERVAL,
-            id="check_medication_schedules",
+            seconds=settings.NOTIFICATION_DELIVERY_INTERVAL,
+            id="deliver_notifications",
             replace_existing=True,
         )
         self.scheduler.add_job(
-            self.handles_missed_medications,
+            self.run_sharded,
             "interval",
+            args=["handles_missed_medications", self.handles_missed_medications],
             minutes=settings.MISSED_INTERVAL,
             id="handles_missed_medications",
             replace_existing=True,
         )
         self.scheduler.add_job(
-            BlacklistedToken.cleanup_expired_tokens,
+            self.run_leased,
             "cron",
+            args=["clean_blacklist_tokens", BlacklistedToken.cleanup_expired_tokens],
+            kwargs={"interval": timedelta(days=1).total_seconds()},
             hour=0,
             minute=0,
             id="clean_blacklist_tokens",
@@ -57,50 +97,213 @@ class Scheduler:
         )
         self.scheduler.start()
 
-    async def generate_medication_reminders(self) -> None:
+    async def run_leased(
+        self,
+        name: str,
+        job: Callable[..., Awaitable[object]],
+        *args: object,
+        interval: float = 0,
+    ) -> None:
+        """
+        Run a job only if this replica holds its lease, so that replicas never
+        run it at the same time. Returns without running it otherwise.
+        With an `interval` in seconds, the lease is kept for most of it after
+        the job starts, so replicas whose ticks are not aligned skip theirs
+        and the job runs once per interval across all replicas.
+        """
+        hold = interval * LEASE_HOLD
+        try:
+            async with leased(
+                self.leases, name, settings.SCHEDULER_LEASE_TTL, hold
+            ) as token:
+                if token is None:
+                    logger.debug(f"Skipping {name}, leased by another replica")
+                    return
+                logger.debug(f"Running {name} with lease token {token}")
+                await job(*args)
+        except LeaseLost:
+            logger.warning(f"Stopped {name}, its lease was lost")
+
+    async def check_due_schedules(self) -> None:
+        await self.run_sharded(
+            "check_medication_schedules", self.check_medication_schedules
+        )
+
+    async def check_due_backstop(self) -> None:
+        """
+        Poll for due schedules behind the due timer, restarting it if it
+        stopped, so that a failing timer only delays notifications.
+        """
+        if not due_timer.running:
+            logger.warning("Due timer is not running, restarting it")
+            due_timer.start(self.check_due_schedules)
+        await self.check_due_schedules()
+
+    async def run_sharded(
+        self, name: str, job: Callable[..., Awaitable[object]]
+    ) -> None:
+        """
+        Run a schedule sweep in SCHEDULER_SHARDS ranges of medication ids, each
+        under its own lease, so that several replicas split a big backlog.
+        Shards are visited from a random one to spread replicas across them.
+        """
+        shards = await self._shard_ranges()
+        offset = random.randrange(len(shards))
+        for i in range(len(shards)):
+            shard = (offset + i) % len(shards)
+            if shards[shard] is None:
+                await self.run_leased(name, job)
+            else:
+                await self.run_leased(f"{name}:{shard}", job, shards[shard])
+
+    async def _shard_ranges(self) -> list[tuple[int, int | None] | None]:
+        shards = settings.SCHEDULER_SHARDS
+        if shards <= 1:
+            return [None]
+        last = await Medication.all().order_by("-id").first()
+        size = (last.id if last else 0) // shards + 1
+        return [
+            (shard * size, (shard + 1) * size if shard < shards - 1 else None)
+            for shard in range(shards)
+        ]
+
+    async def generate_medication_reminders(self) -> int:
         """
         Create medication schedules for the defined period.
-        Skip if already created.
+        Only medications whose `scheduled_until` watermark falls inside the
+        generation horizon are loaded.
+        Returns the number of schedules generated.
         """
         logger.info("Generating medication reminders")
-        now = datetime.now(ZoneInfo("UTC"))
+        now = utc_now()
+        horizon_end = now + timedelta(hours=settings.SCHEDULE_GENERATION_HORIZON)
 
-        future_meds: list[Medication] = await Medication.filter(
-            Q(start_date__gt=now, end_date__isnull=True, is_active=True, is_prn=False)
-            | Q(start_date__gt=now, end_date__gt=now, is_active=True, is_prn=False)
-        ).all()
+        query = Medication.filter(
+            Q(scheduled_until__isnull=True) | Q(scheduled_until__lt=horizon_end),
+            Q(end_date__isnull=True) | Q(end_date__gt=now),
+            is_active=True,
+            is_prn=False,
+            start_date__lte=horizon_end,
+        )
+        batch_size = settings.GENERATION_BATCH_SIZE
+        last_id = 0
+        generated = 0
 
-        for med in future_meds:
-            await med.generate_schedules()
+        while True:
+            medications: list[Medication] = (
+                await query.filter(id__gt=last_id).order_by("id").limit(batch_size)
+            )
+            if not medications:
+                break
+            generated += await Medication.generate_schedules_for(medications)
+            last_id = medications[-1].id
 
-    async def check_medication_schedules(self) -> None:
+        logger.info(f"Generated {generated} medication schedules")
+        return generated
+
+    async def check_medication_schedules(
+        self, medication_ids: tuple[int, int | None] | None = None
+    ) -> int:
         """
         Check for medications schedules that where missed.
         Not yet taken nor notified.
+        Due schedules are moved to NOTIFIED in chunks, one statement per chunk,
+        and their notifications are written to the outbox in the same transaction.
+        Returns the number of schedules notified.
         """
         logger.info("Checking medication schedules for missed medications")
-        now = datetime.now(ZoneInfo("UTC"))
+        now = utc_now()
+        batch_size = settings.NOTIFICATION_BATCH_SIZE
+        notified = 0
 
-        schedules: list[MedicationSchedule] = await MedicationSchedule.filter(
-            status=MedicationStatus.SCHEDULED, scheduled_datetime__lt=now
-        ).all()
+        while True:
+            async with transaction():
+                schedule_ids = await MedicationSchedule.bulk_transition(
+                    MedicationStatus.SCHEDULED,
+                    MedicationStatus.NOTIFIED,
+                    now,
+                    batch_size,
+                    medication_ids,
+                )
+                if schedule_ids:
+                    await MedicationSchedule.enqueue_notifications(schedule_ids)
+            notified += len(schedule_ids)
+            if len(schedule_ids) < batch_size:
+                break
 
-        for schedule in schedules:
-            asyncio.create_task(schedule.handle_medication_notification())
+        logger.info(f"Notified {notified} medication schedules")
+        if notified:
+            await self.deliver_notifications()
+        return notified
 
-    async def handles_missed_medications(self) -> None:
-        """Handles missed medications, bigger than grace period."""
+    async def deliver_notifications(self) -> int:
+        """
+        Hand the due notifications of the outbox to the dispatcher.
+        Returns the number of notifications handed over.
+        """
+        batch_size = settings.NOTIFICATION_DELIVERY_BATCH_SIZE
+        delivered = 0
+        while True:
+            claimed = await deliver_notifications(self.dispatcher, CHANNELS)
+            delivered += claimed
+            if claimed < batch_size:
+                return delivered
+
+    async def handles_missed_medications(
+        self, medication_ids: tuple[int, int | None] | None = None
+    ) -> int:
+        """
+        Handles missed medications, bigger than grace period.
+        Schedules are moved to MISSED in chunks, one statement per chunk, and
+        counted in the daily adherence rollup in the same transaction.
+        Returns the number of schedules marked as missed.
+        """
         logger.info("Checking missed medications")
-        now = datetime.now(ZoneInfo("UTC"))
+        now = utc_now()
         grace_period = timedelta(minutes=settings.MEDICATION_GRACE_PERIOD)
+        batch_size = settings.MISSED_BATCH_SIZE
+        missed = 0
+
+        while True:
+            async with transaction():
+                schedule_ids = await MedicationSchedule.bulk_transition(
+                    MedicationStatus.NOTIFIED,
+                    MedicationStatus.MISSED,
+                    now - grace_period,
+                    batch_size,
+                    medication_ids,
+                )
+            missed += len(schedule_ids)
+            if len(schedule_ids) < batch_size:
+                break
+
+        logger.info(f"Marked {missed} medication schedules as missed")
+        return missed
+
+    async def shutdown(self) -> None:
+        await due_timer.stop()
+        if self.scheduler.running:
+            self.scheduler.shutdown()
+        await self.dispatcher.shutdown()
+
+
+async def main() -> None:
+    """Run the scheduler jobs alone, apart from the API, until SIGINT or SIGTERM."""
+    await init_db(settings.SCHEDULER_DB_POOL_SIZE)
+    scheduler = Scheduler()
+    scheduler.start()
+    logger.info("Scheduler started")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    await stop.wait()
 
-        missed_schedules: list[MedicationSchedule] = await MedicationSchedule.filter(
-            status=MedicationStatus.NOTIFIED,
-            scheduled_datetime__lt=now - grace_period,
-        ).all()
+    logger.info("Scheduler stopping")
+    await scheduler.shutdown()
+    await close_db()
 
-        for schedule in missed_schedules:
-            await schedule.handle_missed_medication()
 
-    def shutdown(self) -> None:
-        self.scheduler.shutdown()
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,46 @@
+from datetime import date, datetime
+
+from pydantic import BaseModel, Field, computed_field
+
+from app.utils.date import Period
+
+
+class AdherenceSchema(BaseModel):
+    taken: int = 0
+    late_taken: int = 0
+    skipped: int = 0
+    missed: int = 0
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def adherence(self) -> float | None:
+        """Percentage of the settled doses that were taken, late or not."""
+        settled = self.taken + self.late_taken + self.skipped + self.missed
+        if not settled:
+            return None
+        return round((self.taken + self.late_taken) / settled * 100, 2)
+
+
+class PeriodAdherenceSchema(AdherenceSchema):
+    period: date
+
+
+class MedicationAdherenceSchema(AdherenceSchema):
+    medication_id: int
+    name: str
+    person_id: int
+    periods: list[PeriodAdherenceSchema]
+
+
+class PersonAdherenceSchema(AdherenceSchema):
+    person_id: int
+    name: str
+    periods: list[PeriodAdherenceSchema]
+
+
+class AdherenceReportSchema(BaseModel):
+    from_: datetime = Field(serialization_alias="from")
+    to: datetime
+    period: Period
+    persons: list[PersonAdherenceSchema]
+    medications: list[MedicationAdherenceSchema]
@@ -1,4 +1,5 @@
 from datetime import datetime
+from enum import StrEnum
 
 from pydantic import BaseModel
 
@@ -15,3 +16,8 @@ class MedicationLogSchema(BaseModel):
 class MedicationLogsSchema(BaseModel):
     medication: MedicationSchema
     logs: list[MedicationLogSchema]
+
+
+class ExportFormat(StrEnum):
+    NDJSON = "ndjson"
+    CSV = "csv"
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import heapq
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from pyttings import settings
+from redis.exceptions import RedisError
+from tortoise.exceptions import BaseORMException
+
+from app.logs import logger
+from app.models.medication_schedule import MedicationSchedule, MedicationStatus
+from app.utils.clock import utc_now
+
+
+class DueTimer:
+    """
+    Wakes up exactly when the next medication schedule is due.
+    Upcoming due times are kept in a min-heap, loaded in windows of
+    DUE_TIMER_WINDOW minutes, and kept up to date by schedule generation
+    and deletion in this process. The window is reloaded at least every
+    DUE_TIMER_REFILL_INTERVAL seconds to see schedules created by other
+    processes.
+    """
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[datetime, int]] = []  # (due datetime, medication id)
+        self._window_end: datetime | None = None
+        self._refill_at = datetime.min.replace(tzinfo=ZoneInfo("UTC"))
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._callback: Callable[[], Awaitable[object]] | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def loaded(self) -> bool:
+        """Whether a window of due times is loaded."""
+        return self._window_end is not None
+
+    @property
+    def next_due(self) -> datetime | None:
+        return self._heap[0][0] if self._heap else None
+
+    def start(self, callback: Callable[[], Awaitable[object]]) -> None:
+        """Start the timer, `callback` is awaited whenever schedules are due."""
+        self._callback = callback
+        self._refill_at = datetime.min.replace(tzinfo=ZoneInfo("UTC"))
+        self._task = asyncio.create_task(self._run())
+        self._task.add_done_callback(self._stopped)
+
+    @staticmethod
+    def _stopped(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Due timer stopped", exc_info=task.exception())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+        self._task = None
+        self._heap = []
+        self._window_end = None
+
+    def wake(self) -> None:
+        """Check the due times now, e.g. after moving a virtual clock."""
+        self._wakeup.set()
+
+    def add(
+        self, medication_id: int, first: datetime, frequency: timedelta, count: int
+    ) -> None:
+        """Add the due times of newly created schedules that fall in the window."""
+        if self._window_end is None:
+            return
+
+        for i in range(count):
+            due = first + i * frequency
+            if due > self._window_end:
+                break
+            heapq.heappush(self._heap, (due, medication_id))
+        self.wake()
+
+    def discard(self, medication_id: int, after: datetime) -> None:
+        """Forget the due times of a medication after a datetime."""
+        self._heap = [
+            (due, med_id)
+            for due, med_id in self._heap
+            if med_id != medication_id or due <= after
+        ]
+        heapq.heapify(self._heap)
+        self.wake()
+
+    async def _refill(self, now: datetime) -> None:
+        """Load the due times of the next window, including overdue ones."""
+        window = timedelta(minutes=settings.DUE_TIMER_WINDOW)
+        max_entries = settings.DUE_TIMER_MAX_ENTRIES
+        rows = (
+            await MedicationSchedule.filter(
+                status=MedicationStatus.SCHEDULED,
+                scheduled_datetime__lte=now + window,
+            )
+            .order_by("scheduled_datetime")
+            .limit(max_entries)
+            .values_list("scheduled_datetime", "medication_id")
+        )
+        self._heap = [(due, medication_id) for due, medication_id in rows]
+        heapq.heapify(self._heap)
+        # A full window may have been truncated, stop it at the last loaded entry
+        self._window_end = rows[-1][0] if len(rows) == max_entries else now + window
+        self._refill_at = max(
+            min(
+                now + (self._window_end - now) / 2,
+                now + timedelta(seconds=settings.DUE_TIMER_REFILL_INTERVAL),
+            ),
+            now + timedelta(seconds=1),
+        )
+        logger.debug(f"Loaded {len(rows)} due times until {self._window_end}")
+
+    async def _run(self) -> None:
+        failures = 0
+        while True:
+            try:
+                await self._tick()
+                failures = 0
+            except (BaseORMException, OSError, RedisError):
+                # Retried with backoff, the due times are kept until then
+                failures += 1
+                delay = min(2**failures, settings.DUE_TIMER_REFILL_INTERVAL)
+                logger.exception(f"Due timer failed, retrying in {delay}s")
+                await asyncio.sleep(delay)
+
+    async def _tick(self) -> None:
+        """Refill the window if needed, then notify or wait for the next due time."""
+        now = utc_now()
+
+        if now >= self._refill_at:
+            await self._refill(now)
+
+        if self._heap and self._heap[0][0] <= now:
+            if self._callback is not None:
+                await self._callback()
+            while self._heap and self._heap[0][0] <= now:
+                heapq.heappop(self._heap)
+            return
+
+        next_at = (
+            min(self._heap[0][0], self._refill_at) if self._heap else self._refill_at
+        )
+        self._wakeup.clear()
+        with contextlib.suppress(TimeoutError):
+            async with asyncio.timeout((next_at - now).total_seconds()):
+                await self._wakeup.wait()
+
+
+due_timer = DueTimer()
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+
+class Clock:
+    """Wall clock, in UTC."""
+
+    def now(self) -> datetime:
+        return datetime.now(ZoneInfo("UTC"))
+
+
+class VirtualClock(Clock):
+    """Clock that only moves when advanced, for simulations and tests."""
+
+    def __init__(self, start: datetime) -> None:
+        self.current = start
+
+    def now(self) -> datetime:
+        return self.current
+
+    def advance(self, delta: timedelta) -> datetime:
+        self.current += delta
+        return self.current
+
+
+_clock: Clock = Clock()
+
+
+def utc_now() -> datetime:
+    """Current time in UTC, from the clock set with `set_clock`."""
+    return _clock.now()
+
+
+def set_clock(clock: Clock) -> Clock:
+    """Replace the clock used by `utc_now`, returns the previous one."""
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
@@ -1,9 +1,26 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from enum import StrEnum
 from zoneinfo import ZoneInfo
 
 
+class Period(StrEnum):
+    DAY = "day"
+    WEEK = "week"  # ISO week, starting on Monday
+    MONTH = "month"
+
+
 def to_utc(dt: datetime, local_tz: str) -> datetime:
     """Convert a naive or local-aware datetime to UTC."""
     if dt.tzinfo is None:
         dt = dt.replace(tzinfo=ZoneInfo(local_tz))
     return dt.astimezone(ZoneInfo("UTC"))
+
+
+def truncate(dt: datetime, period: Period) -> datetime:
+    """Start of the period of a datetime, in its own timezone (like date_trunc)."""
+    dt = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == Period.WEEK:
+        return dt - timedelta(days=dt.weekday())
+    if period == Period.MONTH:
+        return dt.replace(day=1)
+    return dt
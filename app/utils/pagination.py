@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+import base64
+import binascii
+from datetime import datetime
+
+
+def encode_cursor(position: datetime, id: int) -> str:
+    """Opaque cursor of the last row of a page ordered on (datetime, id)."""
+    return base64.urlsafe_b64encode(f"{position.isoformat()},{id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Raises ValueError if the cursor was not made by `encode_cursor`."""
+    try:
+        position, id = base64.urlsafe_b64decode(cursor.encode()).decode().split(",")
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    return datetime.fromisoformat(position), int(id)
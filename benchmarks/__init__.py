@@ -0,0 +1,3 @@
+import os
+
+os.environ.setdefault("PYTTING_SETTINGS_MODULE", "app.settings")
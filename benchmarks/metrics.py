@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import logging
+from contextvars import ContextVar
+
+_queries: ContextVar[list[int] | None] = ContextVar("queries", default=None)
+
+
+class QueryCounter(logging.Handler):
+    """
+    Counts the queries logged by the Tortoise clients, in total and for the
+    current context when inside `track`.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(logging.DEBUG)
+        self.count = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.msg != "%s: %s":
+            return
+        self.count += 1
+        tracked = _queries.get()
+        if tracked is not None:
+            tracked[0] += 1
+
+    def install(self) -> None:
+        db_logger = logging.getLogger("tortoise.db_client")
+        db_logger.setLevel(logging.DEBUG)
+        db_logger.propagate = False
+        db_logger.addHandler(self)
+
+    def uninstall(self) -> None:
+        logging.getLogger("tortoise.db_client").removeHandler(self)
+
+    @staticmethod
+    def track() -> list[int]:
+        """Count the queries of the current task in the returned one item list."""
+        tracked = [0]
+        _queries.set(tracked)
+        return tracked
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of `values`, 0 when empty."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
@@ -0,0 +1,71 @@
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from app.commands.export import export  # noqa: E402
+from app.models.medication_log import MedicationLog  # noqa: E402
+from app.models.medication_schedule import (  # noqa: E402
+    MedicationSchedule,
+    MedicationStatus,
+)
+
+DAY = date(2025, 1, 1)
+
+
+async def _create_history(medication) -> None:
+    start = datetime(2025, 1, 1, tzinfo=ZoneInfo("UTC"))
+    await MedicationSchedule.bulk_create(
+        [
+            MedicationSchedule(
+                medication=medication,
+                scheduled_datetime=start + timedelta(hours=hours),
+                status=MedicationStatus.TAKEN,
+            )
+            for hours in (1, 2, 3, 25)
+        ]
+    )
+    await MedicationLog.bulk_create(
+        [
+            MedicationLog(
+                medication=medication,
+                schedule=schedule,
+                taken_at=schedule.scheduled_datetime,
+            )
+            for schedule in await MedicationSchedule.all().order_by("id")
+        ]
+    )
+
+
+@pytest.mark.asyncio
+async def test_export_parquet(medication, tmp_path):
+    await _create_history(medication)
+
+    counts = await export(DAY, DAY + timedelta(days=3), tmp_path, batch_size=2)
+
+    assert counts == {"medication_schedules": 4, "medication_logs": 4}
+    schedules = pq.read_table(
+        tmp_path / "medication_schedules" / "date=2025-01-01" / "part-0.parquet"
+    )
+    assert schedules.num_rows == 3
+    assert schedules.column("status").to_pylist() == ["taken"] * 3
+    assert schedules.column("person_id").to_pylist() == [medication.person_id] * 3
+    assert (tmp_path / "medication_logs" / "date=2025-01-02").exists()
+    assert not (tmp_path / "medication_logs" / "date=2025-01-03").exists()
+
+
+@pytest.mark.asyncio
+async def test_export_arrow(medication, tmp_path):
+    await _create_history(medication)
+
+    await export(DAY, DAY + timedelta(days=1), tmp_path, "arrow")
+
+    with pa.ipc.open_file(
+        tmp_path / "medication_logs" / "date=2025-01-01" / "part-0.arrow"
+    ) as reader:
+        logs = reader.read_all()
+    assert logs.num_rows == 3
+    assert logs.schema.field("taken_at").type == pa.timestamp("us", tz="UTC")
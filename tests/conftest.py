@@ -1,4 +1,6 @@
 import os
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
 
 import pytest_asyncio
 from tortoise import Tortoise
@@ -7,13 +9,44 @@ from tortoise import Tortoise
 @pytest_asyncio.fixture(scope="function", autouse=True)
 async def initialize_tests():
     """Initialize the database for each test. Clean up after each test."""
+    from app.models.user import claims, users
+
     await Tortoise.init(
         db_url="sqlite://:memory:", modules={"models": ["app.models", "aerich.models"]}
     )
     await Tortoise.generate_schemas()
     yield
     await Tortoise._drop_databases()
+    users.clear()  # ids are reused by the next database
+    claims.clear()
 
 
 def pytest_configure():
     os.environ["PYTTING_SETTINGS_MODULE"] = "tests.settings"
+
+
+@pytest_asyncio.fixture
+async def medication():
+    """Create a scheduled medication for a test person."""
+    from app.models.medication import Medication
+    from app.models.person import Person
+    from app.models.user import User
+
+    user = await User.create(
+        email="test@example.com",
+        password="password",
+        name="Test User",
+        phone_number="+351919999999",
+        birth_date=date(1990, 1, 1),
+    )
+    person = await Person.create(
+        user=user, name="Test Person", birth_date=date(1990, 1, 1)
+    )
+    return await Medication.create(
+        person=person,
+        name="Test Medication",
+        dosage="20mg",
+        start_date=datetime.now(ZoneInfo("UTC")) - timedelta(days=1),
+        frequency=timedelta(hours=1),
+        total_doses=100,
+    )
@@ -1,6 +1,8 @@
 import pytest
+from argon2 import PasswordHasher
 
-from app.models.user import User
+from app.models.user import User, users
+from app.passwords import PasswordsBusy, passwords
 
 
 @pytest.fixture
@@ -177,3 +179,117 @@ async def test_using_blacklisted_token(async_client, token):
     )
     assert response.status_code == 401
     assert response.json() == {"detail": "Authentication failed"}
+
+
+@pytest.mark.asyncio
+async def test_cached_user_is_invalidated(async_client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    response = await async_client.get("/persons/", headers=headers)
+    assert response.status_code != 401
+    user = await User.get(email="test@example.com")
+    assert users.get(user.id) is not None
+
+    await User.filter(id=user.id).update(disabled=True)
+    response = await async_client.get("/persons/", headers=headers)
+    assert response.status_code != 401  # still cached
+
+    await User.invalidate(user.id)
+    response = await async_client.get("/persons/", headers=headers)
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_disabled_user_is_rejected(async_client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    response = await async_client.get("/persons/", headers=headers)
+    assert response.status_code != 401
+
+    user = await User.get(email="test@example.com")
+    user.disabled = True
+    await user.save()
+    response = await async_client.get("/persons/", headers=headers)
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_login_rehashes_password(async_client, sample_user_data):
+    user = await User.create(
+        **{
+            **sample_user_data,
+            "password": PasswordHasher(time_cost=2).hash("testpassword123"),
+        }
+    )
+
+    response = await async_client.post(
+        "/auth/login",
+        json={"email": "test@example.com", "password": "testpassword123"},
+    )
+    assert response.status_code == 200
+
+    await user.refresh_from_db()
+    assert not passwords.needs_rehash(user.password)
+    assert await passwords.verify(user.password, "testpassword123")
+
+
+@pytest.mark.asyncio
+async def test_login_skips_rehash_when_busy(
+    async_client, sample_user_data, monkeypatch
+):
+    password_hash = PasswordHasher(time_cost=2).hash("testpassword123")
+    user = await User.create(**{**sample_user_data, "password": password_hash})
+
+    async def busy(password: str) -> str:
+        raise PasswordsBusy
+
+    monkeypatch.setattr(passwords, "hash", busy)
+    response = await async_client.post(
+        "/auth/login",
+        json={"email": "test@example.com", "password": "testpassword123"},
+    )
+    assert response.status_code == 200
+
+    await user.refresh_from_db()
+    assert user.password == password_hash
+
+
+@pytest.mark.asyncio
+async def test_login_when_busy(async_client, sample_user_data, monkeypatch):
+    await async_client.post("/auth/register", json=sample_user_data)
+    monkeypatch.setattr(passwords, "limit", 0)
+
+    response = await async_client.post(
+        "/auth/login",
+        json={"email": "test@example.com", "password": "testpassword123"},
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+@pytest.mark.asyncio
+async def test_logout_all(async_client, sample_user_data):
+    await async_client.post("/auth/register", json=sample_user_data)
+    login = {"email": "test@example.com", "password": "testpassword123"}
+    tokens = [
+        (await async_client.post("/auth/login", json=login)).json()["token"]
+        for _ in range(2)
+    ]
+
+    response = await async_client.post(
+        "/auth/logout-all", headers={"Authorization": f"Bearer {tokens[0]}"}
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "message": "User test@example.com logged out of every session"
+    }
+
+    for token in tokens:
+        response = await async_client.get(
+            "/persons/", headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 401
+
+    token = (await async_client.post("/auth/login", json=login)).json()["token"]
+    response = await async_client.get(
+        "/persons/", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code != 401
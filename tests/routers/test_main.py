@@ -1,4 +1,5 @@
 import pytest
+from pyttings import settings
 
 
 @pytest.mark.asyncio
@@ -6,3 +7,22 @@ async def test_health(async_client):
     response = await async_client.get("/health")
     assert response.status_code == 200
     assert response.json() == {"status": "healthy"}
+
+
+@pytest.mark.asyncio
+async def test_cache_stats(async_client, token, monkeypatch):
+    response = await async_client.get("/health/caches")
+    assert response.status_code == 404
+
+    monkeypatch.setattr(settings, "CACHE_STATS_ENABLED", True)
+    for _ in range(2):
+        await async_client.get(
+            "/persons/", headers={"Authorization": f"Bearer {token}"}
+        )
+
+    response = await async_client.get("/health/caches")
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["tokens"]["size"] == 1
+    assert stats["tokens"]["hits"] >= 1
+    assert stats["users"]["size"] == 1
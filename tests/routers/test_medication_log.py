@@ -0,0 +1,134 @@
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+import pytest_asyncio
+from pyttings import settings
+
+from app.models.medication import Medication
+from app.models.medication_log import MedicationLog
+from app.models.person import Person
+from app.models.user import User
+
+START = datetime(2025, 1, 1, tzinfo=ZoneInfo("UTC"))
+
+
+@pytest_asyncio.fixture
+async def medication_with_logs(token):
+    """Create a medication with 5 logs, one per hour from START."""
+    user = await User.get(email="test@example.com")
+    person = await Person.create(
+        user=user, name="Test Person", birth_date=date(1990, 1, 1)
+    )
+    medication = await Medication.create(
+        person=person, name="Test Medication", dosage="20mg", start_date=START
+    )
+    await MedicationLog.bulk_create(
+        [
+            MedicationLog(medication=medication, taken_at=START + timedelta(hours=i))
+            for i in range(5)
+        ]
+    )
+    return medication
+
+
+@pytest.mark.asyncio
+async def test_get_medication_logs_pages(async_client, token, medication_with_logs):
+    headers = {"Authorization": f"Bearer {token}"}
+    taken_at = []
+    params: dict = {"limit": 2}
+    while True:
+        response = await async_client.get(
+            "/medication-logs/", params=params, headers=headers
+        )
+        assert response.status_code == 200
+        taken_at += [log["taken_at"] for log in response.json()]
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+
+    assert len(taken_at) == 5
+    assert taken_at == sorted(taken_at, reverse=True)
+
+
+@pytest.mark.asyncio
+async def test_get_medication_logs_range(async_client, token, medication_with_logs):
+    response = await async_client.get(
+        f"/medication-logs/medication/{medication_with_logs.id}",
+        params={
+            "since": (START + timedelta(hours=1)).isoformat(),
+            "until": (START + timedelta(hours=3)).isoformat(),
+        },
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    assert len(response.json()["logs"]) == 2
+    assert "X-Next-Cursor" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_get_medication_logs_invalid_cursor(async_client, token):
+    response = await async_client.get(
+        "/medication-logs/",
+        params={"cursor": "invalid"},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_get_medication_logs_empty(async_client, token):
+    response = await async_client.get(
+        "/medication-logs/", headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "No medication logs found"
+
+
+@pytest.mark.asyncio
+async def test_export_medication_logs(
+    async_client, token, medication_with_logs, monkeypatch
+):
+    monkeypatch.setattr(settings, "EXPORT_CHUNK_SIZE", 2)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = await async_client.get("/medication-logs/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    logs = [json.loads(line) for line in response.text.splitlines()]
+    assert len(logs) == 5
+    assert [log["taken_at"] for log in logs] == sorted(log["taken_at"] for log in logs)
+    assert logs[0]["medication"] == "Test Medication"
+    assert logs[0]["person"] == "Test Person"
+
+    response = await async_client.get(
+        "/medication-logs/export",
+        params={"format": "csv", "medication_id": medication_with_logs.id},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(row["log_id"]) for row in rows] == [log["log_id"] for log in logs]
+
+
+@pytest.mark.asyncio
+async def test_export_medication_logs_not_owned(async_client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = await async_client.get(
+        "/medication-logs/export", params={"person_id": 999}, headers=headers
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Person not found"
+
+    response = await async_client.get(
+        "/medication-logs/export", params={"medication_id": 999}, headers=headers
+    )
+    assert response.status_code == 400
@@ -0,0 +1,158 @@
+from datetime import date, timedelta
+
+import pytest
+import pytest_asyncio
+
+from app.models.medication import Medication
+from app.models.medication_schedule import MedicationSchedule, MedicationStatus
+from app.models.person import Person
+from app.models.user import User
+from app.utils.clock import utc_now
+
+
+@pytest_asyncio.fixture
+async def medication_with_schedules(token):
+    """Create a daily medication with schedules from 20 days ago to 20 days ahead."""
+    user = await User.get(email="test@example.com")
+    person = await Person.create(
+        user=user, name="Test Person", birth_date=date(1990, 1, 1)
+    )
+    now = utc_now().replace(hour=12, minute=0, second=0, microsecond=0)
+    medication = await Medication.create(
+        person=person,
+        name="Test Medication",
+        dosage="20mg",
+        start_date=now - timedelta(days=20),
+        frequency=timedelta(days=1),
+    )
+    await MedicationSchedule.bulk_create(
+        [
+            MedicationSchedule(
+                medication=medication,
+                scheduled_datetime=now + timedelta(days=day),
+                status=MedicationStatus.TAKEN
+                if day < 0
+                else MedicationStatus.SCHEDULED,
+            )
+            for day in range(-20, 21)
+        ]
+    )
+    return medication
+
+
+@pytest.mark.asyncio
+async def test_get_medications_schedules_default_window(
+    async_client, token, medication_with_schedules
+):
+    response = await async_client.get(
+        "/medication-schedules/", headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert response.status_code == 200
+    assert len(response.json()[0]["schedules"]) == 15
+
+
+@pytest.mark.asyncio
+async def test_get_medications_schedules_window_and_status(
+    async_client, token, medication_with_schedules
+):
+    now = utc_now()
+    response = await async_client.get(
+        "/medication-schedules/",
+        params={
+            "from": (now - timedelta(days=30)).isoformat(),
+            "to": (now + timedelta(days=30)).isoformat(),
+            "status": ["taken"],
+        },
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    schedules = response.json()[0]["schedules"]
+    assert len(schedules) == 20
+    assert {schedule["status"] for schedule in schedules} == {"taken"}
+
+
+@pytest.mark.asyncio
+async def test_get_medication_schedule_by_id_window(
+    async_client, token, medication_with_schedules
+):
+    now = utc_now()
+    response = await async_client.get(
+        f"/medication-schedules/{medication_with_schedules.id}",
+        params={"from": now.isoformat(), "to": (now + timedelta(days=3)).isoformat()},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    assert len(response.json()) == 3
+
+
+@pytest.mark.asyncio
+async def test_get_medication_schedule_invalid_window(
+    async_client, token, medication_with_schedules
+):
+    now = utc_now()
+    response = await async_client.get(
+        f"/medication-schedules/{medication_with_schedules.id}",
+        params={"from": now.isoformat(), "to": now.isoformat()},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_get_adherence(async_client, token, medication_with_schedules):
+    today = utc_now().replace(hour=0, minute=0, second=0, microsecond=0)
+    schedules = MedicationSchedule.filter(
+        scheduled_datetime__gte=today - timedelta(days=2),
+        scheduled_datetime__lt=today,
+    ).order_by("scheduled_datetime")
+    await MedicationSchedule.rebuild_daily_adherence()
+    skipped, missed = await schedules
+    await skipped.handle_skipped()
+    await missed.handle_missed_medication()
+    params = {
+        "from": (today - timedelta(days=5)).isoformat(),
+        "to": (today + timedelta(days=2)).isoformat(),
+    }
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = await async_client.get(
+        "/medication-schedules/adherence", params=params, headers=headers
+    )
+
+    assert response.status_code == 200
+    report = response.json()
+    assert report["period"] == "day"
+    assert "from" in report
+    [medication] = report["medications"]
+    assert medication["medication_id"] == medication_with_schedules.id
+    assert medication["taken"] == 3
+    assert medication["skipped"] == medication["missed"] == 1
+    assert medication["adherence"] == 60.0
+    assert len(medication["periods"]) == 5
+    assert medication["periods"][-1]["adherence"] == 0.0
+    [person] = report["persons"]
+    assert person["adherence"] == 60.0
+
+    response = await async_client.get(
+        "/medication-schedules/adherence",
+        params={**params, "period": "month"},
+        headers=headers,
+    )
+    periods = response.json()["medications"][0]["periods"]
+    assert sum(period["taken"] for period in periods) == 3
+    assert all(date.fromisoformat(period["period"]).day == 1 for period in periods)
+
+
+@pytest.mark.asyncio
+async def test_get_adherence_without_doses(async_client, token):
+    response = await async_client.get(
+        "/medication-schedules/adherence",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["medications"] == []
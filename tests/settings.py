@@ -4,6 +4,8 @@ DB_PASSWORD: str = "password"
 DB_HOST: str = "database"
 DB_PORT: int = 5432
 DB_NAME: str = "database"
+DB_POOL_SIZE: int = 5  # connections of the API process
+SCHEDULER_DB_POOL_SIZE: int = 10  # connections of the scheduler process
 
 # Redis
 REDIS_PROTOCOL: str = "redis"
@@ -22,6 +24,55 @@ LOG_LEVEL: str = "INFO"
 # Configs
 ALLOW_REGISTRATION: bool = True
 MAINTENANCE_MODE: bool = False
+SCHEDULER_ENABLED: bool = True  # run the scheduler in the API process
+PAGE_SIZE: int = 100  # default page size of paginated listings
+MAX_PAGE_SIZE: int = 1000
+SCHEDULES_WINDOW_DAYS: int = 7  # default window of schedule listings, around today
+EXPORT_CHUNK_SIZE: int = 1000  # rows read at once by exports
 REMINDER_GENERATION_INTERVAL: int = 12  # in hours
 REMINDER_CHECK_INTERVAL: int = 1  # in minutes
 MISSED_INTERVAL: int = 5  # in minutes
+NOTIFICATION_BATCH_SIZE: int = 1000  # schedules per status update
+MEDICATION_GRACE_PERIOD: int = 60  # in minutes
+MISSED_BATCH_SIZE: int = 5000  # schedules per status update
+GENERATION_BATCH_SIZE: int = 1000  # medications per generation batch
+SCHEDULE_INSERT_BATCH_SIZE: int = 5000  # schedules per insert
+SCHEDULE_GENERATION_SERVER_SIDE: bool = True  # generate_series on Postgres
+SCHEDULE_GENERATION_HORIZON: int = 24  # in hours
+DUE_TIMER_ENABLED: bool = True  # wake up on due times instead of polling
+DUE_TIMER_WINDOW: int = 60  # in minutes
+DUE_TIMER_MAX_ENTRIES: int = 10000  # due times kept in memory
+DUE_TIMER_REFILL_INTERVAL: int = 60  # in seconds, to see other processes
+DUE_TIMER_BACKSTOP_INTERVAL: int = 5  # in minutes, polling behind the timer
+DISPATCHER_CONCURRENCY: int = 10  # notification batches sent at once
+DISPATCHER_QUEUE_SIZE: int = 100  # notification batches waiting to be sent
+SCHEDULER_LEASE_BACKEND: str = "local"  # "redis" across replicas, or "local"
+SCHEDULER_LEASE_TTL: int = 60  # in seconds, extended while a job runs
+SCHEDULER_SHARDS: int = 1  # medication id ranges of the schedule sweeps
+BROADCAST_BACKEND: str = "local"  # "redis" across workers, or "local"
+TOKEN_REVOCATION_BACKEND: str = "database"  # "redis" with expiring keys, or "database"
+USER_CACHE_SIZE: int = 10000  # authenticated users kept per process
+USER_CACHE_TTL: int = 60  # in seconds
+TOKEN_CACHE_SIZE: int = 10000  # verified tokens kept per process
+CACHE_STATS_ENABLED: bool = False  # expose GET /health/caches, for operators
+PASSWORD_HASH_TIME_COST: int = 1  # Argon2 iterations
+PASSWORD_HASH_MEMORY_COST: int = 1024  # Argon2 memory, in KiB
+PASSWORD_HASH_PARALLELISM: int = 1  # Argon2 lanes
+PASSWORD_HASH_WORKERS: int = 4  # passwords hashed at once, in threads
+PASSWORD_HASH_MAX_WAITING: int = 32  # hashes queued before answering 503
+
+# Notifications
+NOTIFICATION_CHANNELS: list[str] = ["loopback"]
+NOTIFICATION_DELIVERY_INTERVAL: int = 10  # in seconds
+NOTIFICATION_COALESCE_WINDOW: int = 0  # in seconds, to group doses per user
+NOTIFICATION_DELIVERY_BATCH_SIZE: int = 1000  # users claimed at once
+NOTIFICATION_DELIVERY_TIMEOUT: int = 300  # in seconds, before a claim expires
+NOTIFICATION_MAX_ATTEMPTS: int = 5
+NOTIFICATION_RETRY_BACKOFF: int = 30  # in seconds, doubled on each attempt
+NOTIFICATION_WEBHOOK_URL: str = ""
+NOTIFICATION_WEBHOOK_TIMEOUT: int = 10  # in seconds
+SMTP_HOST: str = ""
+SMTP_PORT: int = 587
+SMTP_USERNAME: str = ""
+SMTP_PASSWORD: str = ""
+SMTP_SENDER: str = "remedi@localhost"
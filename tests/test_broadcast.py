@@ -0,0 +1,49 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.broadcast import RedisBroadcast
+
+
+async def _wait_until(condition) -> None:
+    for _ in range(100):
+        if condition():
+            break
+        await asyncio.sleep(0.01)
+    assert condition()
+
+
+@pytest.mark.asyncio
+async def test_redis_broadcast():
+    broadcast = RedisBroadcast()
+    broadcast.redis = fakeredis.FakeAsyncRedis()
+    messages: list[str] = []
+    broadcast.subscribe("channel", messages.append)
+
+    await broadcast.start()
+    try:
+        await _wait_until(lambda: broadcast.connected)
+        await broadcast.publish("channel", "message")
+        await _wait_until(lambda: messages == ["message"])
+    finally:
+        await broadcast.stop()
+
+
+@pytest.mark.asyncio
+async def test_redis_broadcast_reconnects():
+    server = fakeredis.FakeServer()
+    server.connected = False
+    broadcast = RedisBroadcast()
+    broadcast.redis = fakeredis.FakeAsyncRedis(server=server)
+    broadcast.retry_delay = 0.01
+
+    await broadcast.start()
+    try:
+        await asyncio.sleep(0.05)  # a few failed attempts
+        assert not broadcast.connected
+
+        server.connected = True
+        await _wait_until(lambda: broadcast.connected)
+    finally:
+        await broadcast.stop()
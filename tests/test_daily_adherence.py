@@ -0,0 +1,101 @@
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.commands.rebuild_adherence import rebuild
+from app.models.daily_adherence import DailyAdherence
+from app.models.medication_schedule import MedicationSchedule, MedicationStatus
+from app.utils.date import Period
+
+START = datetime(2025, 1, 1, 10, tzinfo=ZoneInfo("UTC"))
+
+
+async def _counts() -> dict[tuple[date, str], int]:
+    return {
+        (row.day, row.status): row.count
+        for row in await DailyAdherence.all()
+        if row.count
+    }
+
+
+@pytest.mark.asyncio
+async def test_transitions_update_rollup(medication):
+    await MedicationSchedule.bulk_create(
+        [
+            MedicationSchedule(
+                medication=medication,
+                scheduled_datetime=START + timedelta(days=day),
+                status=MedicationStatus.NOTIFIED,
+            )
+            for day in range(3)
+        ]
+    )
+    first, second, third = (
+        await MedicationSchedule.all().order_by("id").prefetch_related("medication")
+    )
+
+    await first.handle_take_medication()
+    await second.handle_missed_medication()
+    await third.handle_skipped()
+    await second.handle_late_taken()
+
+    assert await _counts() == {
+        (date(2025, 1, 1), "taken"): 1,
+        (date(2025, 1, 2), "late_taken"): 1,
+        (date(2025, 1, 3), "skipped"): 1,
+    }
+    incremental = await _counts()
+    assert await rebuild(chunk_size=1) == 3
+    assert await _counts() == incremental
+
+
+@pytest.mark.asyncio
+async def test_transition_after_concurrent_sweep(medication):
+    schedule = await MedicationSchedule.create(
+        medication=medication,
+        scheduled_datetime=START,
+        status=MedicationStatus.NOTIFIED,
+    )
+    schedule = await MedicationSchedule.get(id=schedule.id).prefetch_related(
+        "medication"
+    )
+    await MedicationSchedule.filter(id=schedule.id).update(
+        status=MedicationStatus.MISSED
+    )
+    await MedicationSchedule.update_daily_adherence(
+        [schedule.id], MedicationStatus.MISSED, MedicationStatus.NOTIFIED
+    )
+
+    await schedule.handle_take_medication()
+
+    assert schedule.status == MedicationStatus.LATE_TAKEN
+    assert await _counts() == {(date(2025, 1, 1), "late_taken"): 1}
+
+    stale = await MedicationSchedule.get(id=schedule.id)
+    await schedule.handle_skipped()
+    await stale.handle_missed_medication()  # loaded before the skip
+
+    assert stale.status == MedicationStatus.SKIPPED
+    assert await _counts() == {(date(2025, 1, 1), "skipped"): 1}
+
+
+@pytest.mark.asyncio
+async def test_count_by_period(medication):
+    await DailyAdherence.bulk_create(
+        [
+            DailyAdherence(
+                medication=medication, day=date(2025, 1, day), status="taken", count=2
+            )
+            for day in range(1, 10)
+        ]
+    )
+
+    rows = await DailyAdherence.count_by_period(
+        [medication.id], date(2025, 1, 2), date(2025, 1, 9), Period.WEEK
+    )
+
+    assert sorted((row["period"], row["count"]) for row in rows) == [
+        (date(2024, 12, 30), 8),
+        (date(2025, 1, 6), 6),
+    ]
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from app.dispatcher import Dispatcher
+from app.notifications import NotificationError
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_limits_concurrency():
+    dispatcher = Dispatcher(concurrency=2, max_queue_size=1)
+    running = 0
+    max_running = 0
+
+    async def work():
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    for _ in range(6):
+        await dispatcher.submit(work)
+    await dispatcher.shutdown()
+
+    assert max_running == 2
+    assert dispatcher.stats == {
+        "queued": 0,
+        "in_flight": 0,
+        "completed": 6,
+        "failed": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_counts_failures():
+    dispatcher = Dispatcher(concurrency=1, max_queue_size=10)
+
+    async def fail():
+        raise NotificationError("Failed")
+
+    async def crash():
+        raise ValueError("Unexpected")
+
+    await dispatcher.submit(crash)
+    await dispatcher.submit(fail)
+    await dispatcher.submit(asyncio.sleep, 0)
+    await dispatcher.submit(crash)  # while shutting down
+    await dispatcher.shutdown()
+
+    assert dispatcher.completed == 1
+    assert dispatcher.failed == 3
+    assert not dispatcher.running
@@ -0,0 +1,181 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import fakeredis
+import pytest
+from pyttings import settings
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.lease import LeaseLost, LocalLeaseBackend, RedisLeaseBackend, leased
+from app.models.medication import Medication
+from app.models.medication_schedule import MedicationSchedule, MedicationStatus
+from app.scheduler import Scheduler
+
+
+class FlakyLeaseBackend(LocalLeaseBackend):
+    """Fails the first `failures` extensions, and every release."""
+
+    def __init__(self, failures: int) -> None:
+        super().__init__()
+        self.failures = failures
+
+    async def extend(self, name: str, token: int, ttl: int) -> bool:
+        if self.failures:
+            self.failures -= 1
+            raise RedisConnectionError("down")
+        return await super().extend(name, token, ttl)
+
+    async def release(self, name: str, token: int) -> None:
+        raise RedisConnectionError("down")
+
+
+@pytest.mark.asyncio
+async def test_local_lease_backend():
+    backend = LocalLeaseBackend()
+
+    token = await backend.acquire("job", 60)
+    assert token is not None
+    assert await backend.acquire("job", 60) is None
+
+    await backend.release("job", token)
+    new_token = await backend.acquire("job", 60)
+    assert new_token is not None
+    assert new_token > token
+    assert not await backend.extend("job", token, 60)  # stale lease token
+
+
+@pytest.mark.asyncio
+async def test_redis_lease_backend():
+    backend = RedisLeaseBackend()
+    backend.redis = fakeredis.FakeAsyncRedis()
+
+    token = await backend.acquire("job", 60)
+    assert token is not None
+    assert await backend.acquire("job", 60) is None
+    assert await backend.extend("job", token, 120)
+    assert 60 < await backend.redis.ttl("lease:job") <= 120
+
+    await backend.release("job", token + 1)  # stale lease token
+    assert await backend.acquire("job", 60) is None
+    assert not await backend.extend("job", token + 1, 60)
+
+    await backend.release("job", token)
+    new_token = await backend.acquire("job", 60)
+    assert new_token is not None
+    assert new_token > token
+
+
+@pytest.mark.asyncio
+async def test_leased_holds_lease_after_block():
+    backend = LocalLeaseBackend()
+
+    async with leased(backend, "job", 60, hold=3600) as token:
+        assert token is not None
+    assert await backend.acquire("job", 60) is None
+
+    async with leased(backend, "other", 60, hold=0.5) as token:
+        assert token is not None
+    assert await backend.acquire("other", 60) is not None  # released
+
+
+@pytest.mark.asyncio
+async def test_leased_raises_when_lease_is_lost():
+    backend = LocalLeaseBackend()
+
+    with pytest.raises(LeaseLost):
+        async with leased(backend, "job", 1) as token:
+            assert token is not None
+            backend._leases["job"] = (token + 1, time.monotonic() + 60)  # taken over
+            await asyncio.sleep(1)
+
+
+@pytest.mark.asyncio
+async def test_leased_retries_failed_extensions():
+    backend = FlakyLeaseBackend(failures=1)
+
+    async with leased(backend, "job", 1) as token:
+        assert token is not None
+        await asyncio.sleep(0.8)  # a failed then a successful extension
+    assert backend.failures == 0
+
+
+@pytest.mark.asyncio
+async def test_leased_is_lost_after_failed_extensions():
+    backend = FlakyLeaseBackend(failures=2)
+
+    with pytest.raises(LeaseLost):
+        async with leased(backend, "job", 1) as token:
+            assert token is not None
+            await asyncio.sleep(1)
+
+
+@pytest.mark.asyncio
+async def test_leased_skips_when_lease_is_unavailable():
+    server = fakeredis.FakeServer()
+    server.connected = False
+    backend = RedisLeaseBackend()
+    backend.redis = fakeredis.FakeAsyncRedis(server=server)
+
+    async with leased(backend, "job", 60) as token:
+        assert token is None
+
+
+@pytest.mark.asyncio
+async def test_run_leased_runs_once():
+    scheduler = Scheduler()
+    runs = []
+
+    async def job():
+        runs.append(1)
+        await asyncio.sleep(0.1)
+
+    await asyncio.gather(*(scheduler.run_leased("job", job) for _ in range(3)))
+
+    assert runs == [1]
+
+
+@pytest.mark.asyncio
+async def test_run_leased_runs_once_per_interval():
+    scheduler = Scheduler()
+    runs = []
+
+    async def job():
+        runs.append(1)
+
+    for _ in range(3):  # ticks of replicas a few seconds apart
+        await scheduler.run_leased("job", job, interval=3600)
+
+    assert runs == [1]
+
+
+@pytest.mark.asyncio
+async def test_run_sharded_sweeps_every_shard(medication, monkeypatch):
+    monkeypatch.setattr(settings, "SCHEDULER_SHARDS", 3)
+    person = await medication.person
+    now = datetime.now(ZoneInfo("UTC"))
+    for i in range(5):
+        other = await Medication.create(
+            person=person,
+            name=f"Medication {i}",
+            dosage="10mg",
+            start_date=medication.start_date,
+            frequency=medication.frequency,
+        )
+        await MedicationSchedule.create(
+            medication=other,
+            scheduled_datetime=now - timedelta(minutes=i + 1),
+            status=MedicationStatus.SCHEDULED,
+        )
+
+    scheduler = Scheduler()
+    assert len(await scheduler._shard_ranges()) == 3
+    await scheduler.run_sharded(
+        "check_medication_schedules", scheduler.check_medication_schedules
+    )
+    await scheduler.shutdown()
+
+    assert (
+        await MedicationSchedule.filter(status=MedicationStatus.NOTIFIED).count() == 5
+    )
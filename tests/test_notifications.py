@@ -0,0 +1,148 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+from pyttings import settings
+
+from app.dispatcher import Dispatcher
+from app.models.medication import Medication
+from app.models.medication_schedule import MedicationSchedule, MedicationStatus
+from app.models.notification import Notification, NotificationStatus
+from app.models.person import Person
+from app.notifications import CHANNELS, NotificationChannel, NotificationError
+from app.notifications.channels import LoopbackChannel
+from app.notifications.delivery import deliver_notifications
+
+
+class FailingChannel(NotificationChannel):
+    name = "failing"
+
+    async def send(self, groups: list[list[Notification]]) -> None:
+        raise NotificationError("unreachable")
+
+
+async def _notify(medication, count: int) -> list[int]:
+    now = datetime.now(ZoneInfo("UTC"))
+    schedules = [
+        await MedicationSchedule.create(
+            medication=medication,
+            scheduled_datetime=now - timedelta(hours=hour),
+            status=MedicationStatus.NOTIFIED,
+        )
+        for hour in range(count)
+    ]
+    schedule_ids = [schedule.id for schedule in schedules]
+    await MedicationSchedule.enqueue_notifications(schedule_ids)
+    return schedule_ids
+
+
+async def _deliver(channels: dict[str, NotificationChannel]) -> int:
+    dispatcher = Dispatcher(concurrency=2, max_queue_size=10)
+    claimed = await deliver_notifications(dispatcher, channels)
+    await dispatcher.shutdown()
+    return claimed
+
+
+@pytest.mark.asyncio
+async def test_enqueue_notifications_is_idempotent(medication, monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFICATION_CHANNELS", ["loopback", "log"])
+    schedule_ids = await _notify(medication, 2)
+
+    await MedicationSchedule.enqueue_notifications(schedule_ids)
+
+    assert await Notification.filter(channel="loopback").count() == 2
+    assert await Notification.filter(channel="log").count() == 2
+    notification = await Notification.filter(channel="loopback").first()
+    assert notification is not None
+    assert notification.payload["medication"] == "Test Medication"
+    assert notification.payload["person"] == "Test Person"
+
+
+@pytest.mark.asyncio
+async def test_deliver_notifications(medication):
+    await _notify(medication, 3)
+
+    assert await _deliver(CHANNELS) == 3
+    assert await Notification.filter(status=NotificationStatus.SENT).count() == 3
+    assert await _deliver(CHANNELS) == 0
+
+
+@pytest.mark.asyncio
+async def test_deliver_notifications_coalesces_per_person(medication):
+    person = await medication.person
+    other = await Person.create(
+        user_id=person.user_id, name="Other Person", birth_date=person.birth_date
+    )
+    other_medication = await Medication.create(
+        person=other,
+        name="Other Medication",
+        dosage="5mg",
+        start_date=medication.start_date,
+        frequency=medication.frequency,
+    )
+    await _notify(medication, 3)
+    await _notify(other_medication, 2)
+    loopback = LoopbackChannel()
+
+    assert await _deliver({"loopback": loopback}) == 5
+    assert len(loopback.sent) == 5
+    doses = sorted(message.count("Medication (") for message in loopback.messages)
+    assert doses == [2, 3]
+
+
+@pytest.mark.asyncio
+async def test_claim_holds_notifications_for_coalesce_window(medication, monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFICATION_COALESCE_WINDOW", 60)
+    await _notify(medication, 1)
+    loopback = LoopbackChannel()
+
+    assert await _deliver({"loopback": loopback}) == 0
+    await Notification.all().update(
+        available_at=datetime.now(ZoneInfo("UTC")) - timedelta(seconds=60)
+    )
+    await _notify(medication, 1)
+    assert await _deliver({"loopback": loopback}) == 2
+    assert len(loopback.messages) == 1
+
+
+@pytest.mark.asyncio
+async def test_deliver_notifications_retries_then_fails(medication, monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFICATION_CHANNELS", ["failing"])
+    monkeypatch.setattr(settings, "NOTIFICATION_MAX_ATTEMPTS", 2)
+    await _notify(medication, 1)
+    channels: dict[str, NotificationChannel] = {"failing": FailingChannel()}
+
+    assert await _deliver(channels) == 1
+    notification = await Notification.get(channel="failing")
+    assert notification.status == NotificationStatus.PENDING
+    assert notification.attempts == 1
+    assert notification.last_error == "unreachable"
+    assert await _deliver(channels) == 0  # backing off
+
+    notification.available_at = datetime.now(ZoneInfo("UTC"))
+    await notification.save()
+    assert await _deliver(channels) == 1
+    await notification.refresh_from_db()
+    assert notification.status == NotificationStatus.FAILED
+    assert notification.attempts == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("channel", "setting", "value", "error"),
+    [
+        ("webhook", "NOTIFICATION_WEBHOOK_URL", "not-a-url", "Webhook failed"),
+        ("email", "SMTP_HOST", "localhost.invalid", "SMTP failed"),
+    ],
+)
+async def test_channel_errors_fail_notifications(
+    medication, monkeypatch, channel, setting, value, error
+):
+    monkeypatch.setattr(settings, "NOTIFICATION_CHANNELS", [channel])
+    monkeypatch.setattr(settings, setting, value)
+    await _notify(medication, 1)
+
+    assert await _deliver(CHANNELS) == 1
+    notification = await Notification.get(channel=channel)
+    assert notification.attempts == 1
+    assert notification.last_error.startswith(error)
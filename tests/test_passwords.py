@@ -0,0 +1,33 @@
+import asyncio
+
+import pytest
+from argon2 import PasswordHasher
+
+from app.passwords import PasswordPool, PasswordsBusy, get_hasher
+
+
+@pytest.mark.asyncio
+async def test_password_pool():
+    pool = PasswordPool(get_hasher(), workers=2, max_waiting=0)
+    password_hash = await pool.hash("password")
+
+    assert await pool.verify(password_hash, "password")
+    assert not await pool.verify(password_hash, "wrong")
+    assert not pool.needs_rehash(password_hash)
+    assert pool.needs_rehash(PasswordHasher(time_cost=2).hash("password"))
+    assert pool.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_password_pool_sheds_excess_calls():
+    pool = PasswordPool(get_hasher(), workers=1, max_waiting=1)
+
+    results = await asyncio.gather(
+        *(pool.hash("password") for _ in range(3)), return_exceptions=True
+    )
+
+    assert [isinstance(result, PasswordsBusy) for result in results] == [
+        False,
+        False,
+        True,
+    ]
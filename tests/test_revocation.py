@@ -0,0 +1,62 @@
+import math
+import time
+
+import fakeredis
+import jwt
+import pytest
+from pyttings import settings
+
+from app.models.user import User
+from app.revocation import (
+    PREFIX,
+    RedisTokenStore,
+    hash_token,
+    is_token_revoked,
+    revoke_token,
+    tokens,
+)
+
+
+@pytest.mark.asyncio
+async def test_revoke_token(medication):
+    person = await medication.person
+    user = await person.user
+    token = user.access_token
+    assert not await is_token_revoked(token)
+
+    await revoke_token(token, user)
+
+    assert await is_token_revoked(token)
+    assert await tokens.contains(token)
+    assert not await is_token_revoked(
+        User(id=2, email="other@example.com").access_token
+    )
+
+
+@pytest.mark.asyncio
+async def test_redis_token_store(medication):
+    person = await medication.person
+    user = await person.user
+    store = RedisTokenStore()
+    store.redis = fakeredis.FakeAsyncRedis()
+
+    def encode(exp: float) -> str:
+        return jwt.encode(
+            {"id": user.id, "exp": exp},
+            settings.JWT_SECRET_KEY,
+            algorithm=settings.JWT_ALGORITHM,
+        )
+
+    exp = time.time() + 60
+    token = encode(exp)
+    expired = encode(time.time() - 1)
+    assert not await store.contains(token)
+
+    await store.add(token, user, "logout")
+    await store.add(expired, user, "logout")
+
+    assert await store.contains(token)
+    assert not await store.contains(expired)  # expired with the token
+    key = f"{PREFIX}{hash_token(token)}"
+    assert await store.redis.expiretime(key) == math.ceil(exp)
+    assert await store.redis.get(key) == f"{user.id}:logout".encode()
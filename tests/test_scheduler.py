@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+from pyttings import settings
+
+from app.models.daily_adherence import DailyAdherence
+from app.models.medication import Medication
+from app.models.medication_schedule import MedicationSchedule, MedicationStatus
+from app.models.notification import Notification, NotificationStatus
+from app.scheduler import Scheduler
+
+
+async def _create_schedules(
+    medication: Medication, hours: list[int], status: MedicationStatus
+) -> None:
+    now = datetime.now(ZoneInfo("UTC"))
+    await MedicationSchedule.bulk_create(
+        [
+            MedicationSchedule(
+                medication=medication,
+                scheduled_datetime=now + timedelta(hours=hour),
+                status=status,
+            )
+            for hour in hours
+        ]
+    )
+
+
+@pytest.mark.asyncio
+async def test_check_medication_schedules(medication, monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFICATION_BATCH_SIZE", 2)
+    await _create_schedules(medication, [-3, -2, -1, 1], MedicationStatus.SCHEDULED)
+
+    scheduler = Scheduler()
+    await scheduler.check_medication_schedules()
+    await scheduler.shutdown()
+
+    assert (
+        await MedicationSchedule.filter(status=MedicationStatus.NOTIFIED).count() == 3
+    )
+    assert (
+        await MedicationSchedule.filter(status=MedicationStatus.SCHEDULED).count() == 1
+    )
+    assert (
+        await Notification.filter(
+            status=NotificationStatus.SENT, channel="loopback"
+        ).count()
+        == 3
+    )
+
+
+@pytest.mark.asyncio
+async def test_handles_missed_medications(medication, monkeypatch):
+    monkeypatch.setattr(settings, "MISSED_BATCH_SIZE", 2)
+    await _create_schedules(medication, [-5, -4, -3], MedicationStatus.NOTIFIED)
+    await _create_schedules(medication, [-2], MedicationStatus.SCHEDULED)
+    await _create_schedules(medication, [0], MedicationStatus.NOTIFIED)
+
+    assert await Scheduler().handles_missed_medications() == 3
+
+    assert await MedicationSchedule.filter(status=MedicationStatus.MISSED).count() == 3
+    assert (
+        await MedicationSchedule.filter(status=MedicationStatus.NOTIFIED).count() == 1
+    )
+    missed = await DailyAdherence.filter(status=MedicationStatus.MISSED).values_list(
+        "count", flat=True
+    )
+    assert sum(missed) == 3
+
+
+@pytest.mark.asyncio
+async def test_generate_medication_reminders(medication):
+    medication.start_date = datetime.now(ZoneInfo("UTC")) + timedelta(hours=1)
+    medication.frequency = timedelta(hours=6)
+    await medication.save()
+
+    await Scheduler().generate_medication_reminders()
+    assert await MedicationSchedule.filter(medication=medication).count() == 4
+
+    await Scheduler().generate_medication_reminders()
+    assert await MedicationSchedule.filter(medication=medication).count() == 4
+
+
+@pytest.mark.asyncio
+async def test_generate_schedules_resumes_after_watermark(medication):
+    medication.total_doses = 5
+    medication.doses_taken = 1
+    await medication.save()
+    await _create_schedules(medication, [1, 2], MedicationStatus.SCHEDULED)
+    latest = await MedicationSchedule.filter(medication=medication).latest(
+        "scheduled_datetime"
+    )
+    medication.scheduled_until = latest.scheduled_datetime
+    await medication.save()
+
+    await medication.generate_schedules()
+
+    schedules = await MedicationSchedule.filter(medication=medication).order_by(
+        "scheduled_datetime"
+    )
+    assert len(schedules) == 4
+    assert schedules[-1].scheduled_datetime - schedules[0].scheduled_datetime == (
+        timedelta(hours=3)
+    )
+    await medication.refresh_from_db()
+    assert medication.scheduled_until == schedules[-1].scheduled_datetime
+
+
+@pytest.mark.asyncio
+async def test_generate_medication_reminders_skips_scheduled(medication):
+    await Scheduler().generate_medication_reminders()
+    assert await MedicationSchedule.filter(medication=medication).count() == 25
+
+    await MedicationSchedule.filter(medication=medication).delete()
+    await Scheduler().generate_medication_reminders()
+    assert await MedicationSchedule.filter(medication=medication).count() == 0
+
+
+@pytest.mark.asyncio
+async def test_intake_keeps_watermark_advanced_meanwhile(medication):
+    loaded = await Medication.get(id=medication.id)
+    await medication.generate_schedules()  # e.g. by the scheduler meanwhile
+
+    await loaded.handle_medication_intake()
+
+    await medication.refresh_from_db()
+    assert medication.scheduled_until is not None
+    assert medication.doses_taken == 1
+    await medication.generate_schedules()
+    assert await MedicationSchedule.filter(medication=medication).count() == 25
+
+
+@pytest.mark.asyncio
+async def test_delete_future_schedules_rewinds_watermark(medication):
+    await medication.generate_schedules()
+    first = await MedicationSchedule.filter(medication=medication).earliest(
+        "scheduled_datetime"
+    )
+
+    await medication.delete_future_schedules()
+
+    await medication.refresh_from_db()
+    assert medication.scheduled_until == first.scheduled_datetime
+    await medication.generate_schedules()
+    assert await MedicationSchedule.filter(medication=medication).count() == 25
@@ -0,0 +1,129 @@
+import asyncio
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+from pyttings import settings
+
+from app.models.medication_schedule import MedicationSchedule
+from app.scheduler import Scheduler
+from app.timer import DueTimer, due_timer
+from app.utils.clock import VirtualClock, set_clock
+
+
+@pytest.fixture
+def clock():
+    clock = VirtualClock(datetime.now(ZoneInfo("UTC")))
+    previous = set_clock(clock)
+    yield clock
+    set_clock(previous)
+
+
+async def _wait_until(condition) -> None:
+    for _ in range(100):
+        if condition():
+            break
+        await asyncio.sleep(0.01)
+    assert condition()
+
+
+async def _start_timer(timer: DueTimer) -> asyncio.Event:
+    fired = asyncio.Event()
+
+    async def callback():
+        fired.set()
+
+    timer.start(callback)
+    await _wait_until(lambda: timer.loaded)
+    return fired
+
+
+@pytest.mark.asyncio
+async def test_due_timer_loads_due_schedules(medication, clock):
+    due = clock.now() + timedelta(seconds=10)
+    await MedicationSchedule.create(medication=medication, scheduled_datetime=due)
+    timer = DueTimer()
+    fired = await _start_timer(timer)
+    assert timer.next_due == due
+    assert not fired.is_set()
+
+    clock.advance(timedelta(seconds=10))
+    timer.wake()
+
+    await asyncio.wait_for(fired.wait(), timeout=2)
+    await timer.stop()
+
+
+@pytest.mark.asyncio
+async def test_due_timer_add(medication, clock):
+    timer = DueTimer()
+    fired = await _start_timer(timer)
+
+    first = clock.now() + timedelta(seconds=10)
+    timer.add(medication.id, first, medication.frequency, 3)
+    assert timer.next_due == first
+
+    clock.advance(timedelta(seconds=10))
+    timer.wake()
+
+    await asyncio.wait_for(fired.wait(), timeout=2)
+    await timer.stop()
+
+
+@pytest.mark.asyncio
+async def test_due_timer_discard(medication, clock):
+    timer = DueTimer()
+    fired = await _start_timer(timer)
+
+    now = clock.now()
+    timer.add(medication.id, now + timedelta(seconds=10), medication.frequency, 3)
+    timer.discard(medication.id, now)
+    assert timer.next_due is None
+
+    clock.advance(timedelta(seconds=10))
+    timer.wake()
+    await asyncio.sleep(0)
+
+    assert not fired.is_set()
+    await timer.stop()
+
+
+@pytest.mark.asyncio
+async def test_due_timer_retries_failed_callback(medication, monkeypatch):
+    monkeypatch.setattr(settings, "DUE_TIMER_REFILL_INTERVAL", 0)  # no backoff
+    await MedicationSchedule.create(
+        medication=medication, scheduled_datetime=datetime.now(ZoneInfo("UTC"))
+    )
+    calls = []
+    fired = asyncio.Event()
+
+    async def callback():
+        calls.append(1)
+        if len(calls) == 1:
+            raise OSError("connection lost")
+        fired.set()
+
+    timer = DueTimer()
+    timer.start(callback)
+
+    await asyncio.wait_for(fired.wait(), timeout=2)
+    assert timer.running
+    await timer.stop()
+
+
+@pytest.mark.asyncio
+async def test_check_due_backstop_restarts_timer(monkeypatch):
+    scheduler = Scheduler()
+    checks = []
+
+    async def check_due_schedules():
+        checks.append(1)
+
+    monkeypatch.setattr(scheduler, "check_due_schedules", check_due_schedules)
+    assert not due_timer.running
+
+    await scheduler.check_due_backstop()
+
+    assert due_timer.running
+    assert checks
+    await due_timer.stop()
@@ -0,0 +1,96 @@
+import time
+
+import jwt
+import pytest
+from pyttings import settings
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.broadcast import broadcast
+from app.database import transaction
+from app.models.user import (
+    User,
+    claims,
+    decode_token,
+    fetching,
+    forget,
+    stale,
+    users,
+)
+
+
+@pytest.mark.asyncio
+async def test_user_is_invalidated_after_commit(medication):
+    user = await (await medication.person).user
+    users.set(user.id, user)
+
+    async with transaction():
+        user.disabled = True
+        await user.save()
+        assert users.get(user.id) is not None  # other workers would refetch it
+
+    assert users.get(user.id) is None
+
+
+@pytest.mark.asyncio
+async def test_user_is_saved_when_broadcasts_fail(medication, monkeypatch):
+    user = await (await medication.person).user
+    users.set(user.id, user)
+
+    async def publish(channel: str, message: str) -> None:
+        raise RedisConnectionError("down")
+
+    monkeypatch.setattr(broadcast, "publish", publish)
+    user.disabled = True
+    await user.save()
+
+    assert users.get(user.id) is None
+    assert (await User.get(id=user.id)).disabled
+
+
+@pytest.mark.asyncio
+async def test_user_invalidated_during_fetch_is_not_cached(medication, monkeypatch):
+    user = await (await medication.person).user
+    get = User.get
+
+    async def get_invalidated(**kwargs) -> User:
+        fetched = await get(**kwargs)
+        forget(fetched.id)  # invalidated by another worker meanwhile
+        return fetched
+
+    monkeypatch.setattr(User, "get", get_invalidated)
+    assert (await User.from_jwt(user.access_token)).id == user.id
+    assert users.get(user.id) is None
+    assert not fetching
+    assert not stale
+
+    monkeypatch.undo()
+    await User.from_jwt(user.access_token)
+    assert users.get(user.id) is not None
+
+
+def _encode(exp: float) -> str:
+    return jwt.encode(
+        {"id": 1, "email": "test@example.com", "exp": exp},
+        settings.JWT_SECRET_KEY,
+        algorithm=settings.JWT_ALGORITHM,
+    )
+
+
+def test_decode_token_is_cached_until_expiry(monkeypatch):
+    token = _encode(time.time() + 60)
+    assert decode_token(token)["id"] == 1
+    hits = claims.hits
+    assert decode_token(token)["id"] == 1
+    assert claims.hits == hits + 1
+
+    now = claims.timer()
+    monkeypatch.setattr(claims, "timer", lambda: now + 61)
+    misses = claims.misses
+    assert decode_token(token)["id"] == 1
+    assert claims.misses == misses + 1
+
+
+def test_decode_token_rejects_expired_tokens():
+    with pytest.raises(jwt.ExpiredSignatureError):
+        decode_token(_encode(time.time() - 1))
+    assert len(claims) == 0
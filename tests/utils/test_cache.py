@@ -0,0 +1,33 @@
+from app.utils.cache import TTLCache
+
+
+def test_ttl_cache_expires():
+    now = [0.0]
+    cache: TTLCache[str, int] = TTLCache(10, 60, timer=lambda: now[0])
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+
+    now[0] = 60
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+    cache.set("b", 2, ttl=10)
+    now[0] = 70
+    assert cache.get("b") is None
+    assert cache.stats == {"size": 0, "hits": 1, "misses": 2}
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache: TTLCache[str, int] = TTLCache(2, 60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+    cache.pop("a")
+    assert cache.get("a") is None
+    assert len(TTLCache(0, 60)) == 0
@@ -0,0 +1,21 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from app.utils.clock import VirtualClock, set_clock, utc_now
+
+
+def test_utc_now_is_aware():
+    assert utc_now().tzinfo == ZoneInfo("UTC")
+
+
+def test_virtual_clock():
+    start = datetime(2025, 1, 1, tzinfo=ZoneInfo("UTC"))
+    clock = VirtualClock(start)
+    previous = set_clock(clock)
+    try:
+        assert utc_now() == start
+        clock.advance(timedelta(hours=1))
+        assert utc_now() == start + timedelta(hours=1)
+    finally:
+        set_clock(previous)
+    assert utc_now() != start + timedelta(hours=1)
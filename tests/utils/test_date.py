@@ -3,7 +3,7 @@ from zoneinfo import ZoneInfo
 
 import pytest
 
-from app.utils.date import to_utc
+from app.utils.date import Period, to_utc, truncate
 
 
 def test_naive_datetime_converted_to_utc():
@@ -139,3 +139,19 @@ def test_parametrized_timezone_conversions(local_tz, naive_time, expected_utc_ti
     """Parametrized test for multiple timezone conversions."""
     result = to_utc(naive_time, local_tz)
     assert result == expected_utc_time.replace(tzinfo=ZoneInfo("UTC"))
+
+
+@pytest.mark.parametrize(
+    "period,start",
+    [
+        (Period.DAY, datetime(2023, 6, 15)),
+        (Period.WEEK, datetime(2023, 6, 12)),
+        (Period.MONTH, datetime(2023, 6, 1)),
+    ],
+)
+def test_truncate(period, start):
+    """Test the start of the day, week and month of a datetime."""
+    tz = ZoneInfo("Europe/Lisbon")
+    dt = datetime(2023, 6, 15, 13, 30, tzinfo=tz)
+
+    assert truncate(dt, period) == start.replace(tzinfo=tz)
@@ -0,0 +1,18 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.utils.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    position = datetime(2025, 1, 1, 8, 30, tzinfo=ZoneInfo("UTC"))
+
+    assert decode_cursor(encode_cursor(position, 42)) == (position, 42)
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "bm9wZQ==", "YSxi"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)